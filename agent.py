@@ -1,10 +1,24 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
 from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import SystemMessage, RemoveMessage, HumanMessage
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.messages import SystemMessage, RemoveMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import MessagesState, StateGraph, START, END
+from checkpointer import SQLCheckpointer
+from db import get_engine
+from agent_tracing import AgentTracer
+from tool_executor import ToolExecutor
 
-memory = MemorySaver()
+# Checkpoints persist across restarts and workers; point this at Postgres in production.
+# The database is only opened on the first turn, not when this module is imported
+CHECKPOINT_URL = os.environ.get("AGENT_CHECKPOINT_URL", "sqlite:///agent_checkpoints.db")
+
+memory = SQLCheckpointer(get_engine(CHECKPOINT_URL))
 
 # Unified state class handling both summary and tool invocation signals
 class CombinedState(MessagesState):
@@ -14,6 +28,19 @@ class CombinedState(MessagesState):
 model = ChatAnthropic(model_name="claude-3-haiku-20240307")
 model_with_tools = ChatAnthropic(model_name="model-tool-capable")
 
+# LangChain tools the agent may call; create idempotent ones with metadata={"idempotent": True}
+# so repeated calls are served from the executor's cache
+TOOLS = []
+TOOL_TIMEOUTS = {}  # Per-tool overrides of tool_executor.TOOL_TIMEOUT_SECONDS
+if TOOLS:
+    model_with_tools = model_with_tools.bind_tools(TOOLS)
+tool_executor = ToolExecutor(TOOLS, timeouts=TOOL_TIMEOUTS)
+
+# Summarization runs in the background once a thread's messages pass the token budget
+SUMMARY_TOKEN_BUDGET = 2000
+KEEP_RECENT_MESSAGES = 2  # Messages left verbatim after a summary
+SUMMARY_WORKERS = 2
+
 # Logic to handle model invocation (conversation node)
 def handle_conversation(state: CombinedState):
     summary = state.get("summary", "")
@@ -23,20 +50,18 @@ def handle_conversation(state: CombinedState):
     else:
         messages = state["messages"]
     
-    response = model.invoke(messages)
+    response = (model_with_tools if TOOLS else model).invoke(messages)
     return {"messages": [response]}
 
-def should_continue_or_tools(state: CombinedState) -> Literal["summarize_conversation", "tools", END]:
+def should_continue_or_tools(state: CombinedState) -> Literal["tools", END]:
     messages = state["messages"]
     last_message = messages[-1]
    
-    if len(messages) > 6:
-        return "summarize_conversation"
     if last_message.tool_calls:
         return "tools"
     return END
 
-def summarize_conversation(state: CombinedState):
+def summarize_conversation(state: CombinedState, config=None):
     summary = state.get("summary", "")
     summary_message = (
         f"This is summary of the conversation to date: {summary}\n\n"
@@ -44,28 +69,81 @@ def summarize_conversation(state: CombinedState):
         else "Create a summary of the conversation above:"
     )
     messages = state["messages"] + [HumanMessage(content=summary_message)]
-    response = model.invoke(messages)
+    response = model.invoke(messages, config=config)
 
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
+    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:prune_boundary(state["messages"])]]
     return {"summary": response.content, "messages": delete_messages}
 
+def prune_boundary(messages):
+    """Index of the first message kept after a summary: the last KEEP_RECENT_MESSAGES,
+    moved back so tool results keep the AI message whose tool_calls they answer."""
+    cut = max(0, len(messages) - KEEP_RECENT_MESSAGES)
+    while cut > 0 and isinstance(messages[cut], ToolMessage):
+        cut -= 1
+    return cut
+
+# Executes every tool call of the last message concurrently and returns one ToolMessage per call
 def tool_node(state: CombinedState):
-    messages = state["messages"]
-    response = model_with_tools.invoke(messages)
-    return {"messages": [response]}
+    return {"messages": tool_executor.run(state["messages"][-1].tool_calls)}
+
+async def atool_node(state: CombinedState):
+    return {"messages": await tool_executor.arun(state["messages"][-1].tool_calls)}
 
 workflow = StateGraph(CombinedState)
 
 # Define nodes
 workflow.add_node("conversation", handle_conversation)
-workflow.add_node("summarize_conversation", summarize_conversation)
-workflow.add_node("tools", tool_node)
+workflow.add_node("tools", RunnableLambda(tool_node, afunc=atool_node))
 
 # Set initial node and define transitions
 workflow.add_edge(START, "conversation")
-workflow.add_conditional_edges("conversation", should_continue_or_tools, ["summarize_conversation", "tools", END])
-workflow.add_edge("summarize_conversation", END)
+workflow.add_conditional_edges("conversation", should_continue_or_tools, ["tools", END])
 workflow.add_edge("tools", "conversation")
 
 # Compile the application
 app = workflow.compile(checkpointer=memory)
+
+logger = logging.getLogger(__name__)
+tracer = AgentTracer()  # Per-node latency, token and state-size metrics; see agent_tracing.py
+summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summarize")
+summaries_running = set()
+summaries_lock = threading.Lock()
+# Turns and summary updates on the same thread are serialized; a fixed set of locks keeps memory flat
+thread_locks = [threading.Lock() for _ in range(64)]
+
+def thread_lock(thread_id):
+    return thread_locks[hash(thread_id) % len(thread_locks)]
+
+def chat(thread_id, text):
+    """Run one turn and return its final state; summarizing, if due, happens after this returns."""
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [tracer]}
+    with thread_lock(thread_id):
+        state = app.invoke({"messages": [HumanMessage(content=text)]}, config)
+    schedule_summary(thread_id, state)
+    return state
+
+def schedule_summary(thread_id, state):
+    tokens = count_tokens_approximately(state["messages"]) + count_tokens_approximately([state.get("summary", "")])
+    if tokens <= SUMMARY_TOKEN_BUDGET or len(state["messages"]) <= KEEP_RECENT_MESSAGES:
+        return
+    with summaries_lock:
+        if thread_id in summaries_running:
+            return
+        summaries_running.add(thread_id)
+    summary_executor.submit(apply_summary, thread_id, state)
+
+def apply_summary(thread_id, state):
+    # The model call runs unlocked; only the checkpoint update waits for an in-flight turn.
+    # RemoveMessage targets ids, so messages added since `state` was taken are kept.
+    try:
+        start = time.perf_counter()
+        update = summarize_conversation(state, config={
+            "callbacks": [tracer], "metadata": {"langgraph_node": "summarize_conversation", "thread_id": thread_id}})
+        tracer.record_node("summarize_conversation", thread_id, time.perf_counter() - start, state)
+        with thread_lock(thread_id):
+            app.update_state({"configurable": {"thread_id": thread_id}}, update, as_node="conversation")
+    except Exception:
+        logger.exception("Summarizing thread %s failed; it will be retried after the next turn", thread_id)
+    finally:
+        with summaries_lock:
+            summaries_running.discard(thread_id)
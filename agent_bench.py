@@ -0,0 +1,88 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+import agent
+from checkpointer import SQLCheckpointer
+from db import get_engine
+
+# Replays recorded conversations through the agent graph against a
+# deterministic fake chat model and prints the per-node tracing histograms.
+#
+#   python agent_bench.py --conversations 20 --turns 12 --model-latency 0.05
+#   python agent_bench.py --recording conversations.json --format prometheus
+#
+# A recording is a JSON list of {"thread_id": ..., "turns": ["user message", ...]}.
+# Checkpoints go to a temporary SQLite database, so runs do not touch real threads.
+
+class FakeChatModel(BaseChatModel):
+    """Chat model whose reply depends only on the prompt, with a fixed latency and approximate token usage."""
+
+    latency: float = 0.0
+    reply_words: int = 40
+
+    @property
+    def _llm_type(self):
+        return "fake-deterministic"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        digest = hashlib.sha256("".join(str(message.content) for message in messages).encode("utf-8")).hexdigest()
+        content = " ".join(digest[i % 56:i % 56 + 8] for i in range(self.reply_words))
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([content])
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def synthetic_recording(conversations, turns):
+    return [{"thread_id": f"bench-{n}", "turns": [f"Question {t} in conversation {n}: how are orders linked to users?"
+                                                 for t in range(turns)]}
+            for n in range(conversations)]
+
+def replay(recording):
+    turn_seconds = []
+    for conversation in recording:
+        for text in conversation["turns"]:
+            start = time.perf_counter()
+            agent.chat(conversation["thread_id"], text)
+            turn_seconds.append(time.perf_counter() - start)
+    agent.summary_executor.shutdown(wait=True)  # Let background summaries land in the histograms
+    return turn_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay conversations through agent.py and report per-node metrics")
+    parser.add_argument("--recording", help="JSON file of recorded conversations; synthetic ones are used without it")
+    parser.add_argument("--conversations", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--model-latency", type=float, default=0.0, help="seconds the fake model sleeps per call")
+    parser.add_argument("--reply-words", type=int, default=40)
+    parser.add_argument("--summary-token-budget", type=int, default=agent.SUMMARY_TOKEN_BUDGET)
+    parser.add_argument("--format", choices=["json", "prometheus"], default="json")
+    args = parser.parse_args()
+
+    if args.recording:
+        with open(args.recording) as f:
+            recording = json.load(f)
+    else:
+        recording = synthetic_recording(args.conversations, args.turns)
+
+    agent.model = FakeChatModel(latency=args.model_latency, reply_words=args.reply_words)
+    agent.SUMMARY_TOKEN_BUDGET = args.summary_token_budget
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpointer = SQLCheckpointer(get_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}"))
+        agent.app = agent.workflow.compile(checkpointer=checkpointer)
+        turn_seconds = sorted(replay(recording))
+
+    print(agent.tracer.prometheus_text() if args.format == "prometheus" else agent.tracer.to_json())
+    print(f"{len(turn_seconds)} turns, p50 {turn_seconds[len(turn_seconds) // 2]:.3f}s, "
+          f"p95 {turn_seconds[int(0.95 * (len(turn_seconds) - 1))]:.3f}s, max {turn_seconds[-1]:.3f}s")
+
+if __name__ == "__main__":
+    main()
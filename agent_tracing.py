@@ -0,0 +1,173 @@
+import bisect
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Per-node tracing for the agent graph: a LangChain callback handler that
+# records wall time and state size per node, and latency and token usage per
+# model call, into histograms (exported as Prometheus text or JSON) and
+# per-thread totals.
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+MAX_TRACED_THREADS = 1000  # Per-thread totals kept, least recently active dropped first
+
+METRICS = {
+    "agent_node_seconds": ("Wall time per graph node run", SECONDS_BUCKETS),
+    "agent_node_state_bytes": ("Size of the message state a node starts with", BYTES_BUCKETS),
+    "agent_model_seconds": ("Chat model latency per call", SECONDS_BUCKETS),
+    "agent_model_input_tokens": ("Prompt tokens per chat model call", TOKEN_BUCKETS),
+    "agent_model_output_tokens": ("Completion tokens per chat model call", TOKEN_BUCKETS),
+}
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+def state_bytes(state):
+    if not isinstance(state, dict):
+        return 0
+    messages = state.get("messages", [])
+    return sum(len(str(getattr(message, "content", message)).encode("utf-8")) for message in messages) + \
+        len(str(state.get("summary", "")).encode("utf-8"))
+
+class AgentTracer(BaseCallbackHandler):
+    """Callback handler collecting per-node and per-thread latency, token and state-size metrics.
+
+    Pass it in the run config (`{"callbacks": [tracer]}`); model calls made
+    outside the graph are attributed by setting `langgraph_node` and
+    `thread_id` in their config metadata.
+    """
+
+    def __init__(self):
+        self.histograms = defaultdict(dict)  # metric -> node -> Histogram
+        self.threads = OrderedDict()  # thread_id -> node -> totals
+        self.runs = {}  # run_id -> (node, thread_id, start, state bytes)
+        self.lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run; routing functions and nested runnables share its metadata
+        if node and kwargs.get("name") == node:
+            with self.lock:
+                self.runs[run_id] = (node, metadata.get("thread_id"), time.perf_counter(), state_bytes(inputs))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self.finish_node(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.finish_node(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        with self.lock:
+            self.runs[run_id] = (metadata.get("langgraph_node", "unknown"), metadata.get("thread_id"), time.perf_counter(), 0)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+            if run is None:
+                return
+            node, thread_id, start, _ = run
+            elapsed = time.perf_counter() - start
+            usage = {}
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+            self.observe("agent_model_seconds", node, elapsed)
+            self.observe("agent_model_input_tokens", node, usage.get("input_tokens", 0))
+            self.observe("agent_model_output_tokens", node, usage.get("output_tokens", 0))
+            totals = self.thread_totals(thread_id, node)
+            totals["model_calls"] += 1
+            totals["model_seconds"] += elapsed
+            totals["input_tokens"] += usage.get("input_tokens", 0)
+            totals["output_tokens"] += usage.get("output_tokens", 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            self.runs.pop(run_id, None)
+
+    def finish_node(self, run_id):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+            if run is None:
+                return
+            node, thread_id, start, nbytes = run
+            self.node_done(node, thread_id, time.perf_counter() - start, nbytes)
+
+    def record_node(self, node, thread_id, seconds, state=None):
+        """Record a step that runs outside the graph (e.g. background summarization) as a node."""
+        with self.lock:
+            self.node_done(node, thread_id, seconds, None if state is None else state_bytes(state))
+
+    def node_done(self, node, thread_id, seconds, nbytes=None):
+        # Caller holds self.lock
+        self.observe("agent_node_seconds", node, seconds)
+        totals = self.thread_totals(thread_id, node)
+        totals["runs"] += 1
+        totals["seconds"] += seconds
+        if nbytes is not None:
+            self.observe("agent_node_state_bytes", node, nbytes)
+            totals["state_bytes"] += nbytes
+            totals["state_bytes_max"] = max(totals["state_bytes_max"], nbytes)
+
+    def observe(self, metric, node, value):
+        # Caller holds self.lock
+        histogram = self.histograms[metric].get(node)
+        if histogram is None:
+            histogram = self.histograms[metric][node] = Histogram(METRICS[metric][1])
+        histogram.observe(value)
+
+    def thread_totals(self, thread_id, node):
+        # Caller holds self.lock
+        nodes = self.threads.setdefault(thread_id, defaultdict(lambda: defaultdict(int)))
+        self.threads.move_to_end(thread_id)
+        while len(self.threads) > MAX_TRACED_THREADS:
+            self.threads.popitem(last=False)
+        return nodes[node]
+
+    def prometheus_text(self):
+        """Histograms in the Prometheus text exposition format, labelled by node."""
+        lines = []
+        with self.lock:
+            for metric, by_node in sorted(self.histograms.items()):
+                lines += [f"# HELP {metric} {METRICS[metric][0]}", f"# TYPE {metric} histogram"]
+                for node, histogram in sorted(by_node.items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{metric}_bucket{{node="{node}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_sum{{node="{node}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{node="{node}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        """Histograms per metric and node, plus per-thread totals per node, as a JSON string."""
+        with self.lock:
+            report = {
+                "histograms": {
+                    metric: {node: {"buckets": [[str(bound), count] for bound, count in histogram.cumulative()],
+                                    "sum": histogram.sum, "count": histogram.count}
+                             for node, histogram in by_node.items()}
+                    for metric, by_node in self.histograms.items()
+                },
+                "threads": {str(thread_id): {node: dict(totals) for node, totals in nodes.items()}
+                            for thread_id, nodes in self.threads.items()},
+            }
+        return json.dumps(report, indent=2)
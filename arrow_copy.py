@@ -0,0 +1,286 @@
+import json
+import struct
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# PostgreSQL binary COPY framing (see "COPY ... Binary Format" in the PG docs)
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+NULL_FIELD = struct.pack("!i", -1)
+
+# PostgreSQL dates/timestamps count from 2000-01-01, Arrow from 1970-01-01
+PG_EPOCH_DAYS = 10957
+PG_EPOCH_MICROS = PG_EPOCH_DAYS * 86400 * 1000000
+
+TEXT_NULL = "\\N"
+TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+TEXT_ESCAPE_PAIRS = [("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")]  # Backslash first
+
+def _fixed_width(fmt):
+    packer = struct.Struct("!i" + fmt)
+    size = packer.size - 4
+    return lambda value: packer.pack(size, value)
+
+def _variable_width(value):
+    return struct.pack("!i", len(value)) + value
+
+def _encode_text_field(value):
+    return _variable_width(value.encode("utf-8"))
+
+def _encode_bool_field(value):
+    return b"\x00\x00\x00\x01\x01" if value else b"\x00\x00\x00\x01\x00"
+
+def _to_pg_days(column):
+    return pc.subtract(column.cast(pa.date32()).cast(pa.int32()), PG_EPOCH_DAYS)
+
+def _to_pg_micros(column):
+    column = pc.cast(column, pa.timestamp("us", tz=column.type.tz), safe=False)
+    return pc.subtract(column.cast(pa.int64()), PG_EPOCH_MICROS)
+
+def _unchanged(column):
+    return column
+
+def binary_encoder(arrow_type):
+    """Return (prepare, encode) for a column type, or None if binary COPY can't carry it.
+
+    `prepare` converts a whole Arrow column into the units PostgreSQL expects,
+    `encode` turns one resulting Python value into a length-prefixed field.
+    The Arrow type decides the wire type, so the target column must use the
+    matching PostgreSQL type (int64 -> bigint, float64 -> double precision, ...).
+    """
+    if pa.types.is_dictionary(arrow_type):
+        inner = binary_encoder(arrow_type.value_type)
+        if inner is None:
+            return None
+        prepare, encode = inner
+        return (lambda column: prepare(column.dictionary_decode())), encode
+    if pa.types.is_boolean(arrow_type):
+        return _unchanged, _encode_bool_field
+    if arrow_type in (pa.int8(), pa.int16(), pa.uint8()):
+        return _unchanged, _fixed_width("h")
+    if arrow_type in (pa.int32(), pa.uint16()):
+        return _unchanged, _fixed_width("i")
+    if arrow_type in (pa.int64(), pa.uint32()):
+        return _unchanged, _fixed_width("q")
+    if arrow_type == pa.float32():
+        return _unchanged, _fixed_width("f")
+    if arrow_type == pa.float64():
+        return _unchanged, _fixed_width("d")
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return _unchanged, _encode_text_field
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return _unchanged, _variable_width
+    if pa.types.is_date(arrow_type):
+        return _to_pg_days, _fixed_width("i")
+    if pa.types.is_timestamp(arrow_type):
+        return _to_pg_micros, _fixed_width("q")
+    return None
+
+def choose_copy_format(schema, preferred="binary"):
+    """Use binary COPY when every column type has a binary encoder, otherwise text."""
+    if preferred == "binary" and all(binary_encoder(field.type) is not None for field in schema):
+        return "binary"
+    return "text"
+
+# PostgreSQL base type -> (Arrow type the column is cast to, Arrow kinds it accepts,
+# whether binary COPY can carry it). A None Arrow type means the values are sent
+# as text in whatever type they already have.
+PG_ARROW_TYPES = {
+    "int2": (pa.int16(), {"integer"}, True),
+    "int4": (pa.int32(), {"integer"}, True),
+    "int8": (pa.int64(), {"integer"}, True),
+    "float4": (pa.float32(), {"integer", "floating"}, True),
+    "float8": (pa.float64(), {"integer", "floating"}, True),
+    "numeric": (None, {"integer", "floating", "decimal"}, False),
+    "bool": (pa.bool_(), {"boolean"}, True),
+    "text": (pa.string(), {"string"}, True),
+    "varchar": (pa.string(), {"string"}, True),
+    "bpchar": (pa.string(), {"string"}, True),
+    "uuid": (None, {"string"}, False),
+    "json": (None, {"string"}, False),
+    "jsonb": (None, {"string"}, False),
+    "bytea": (pa.binary(), {"binary"}, True),
+    "date": (pa.date32(), {"date"}, True),
+    "time": (None, {"time"}, False),
+    "timestamp": (pa.timestamp("us"), {"date", "timestamp"}, True),
+    "timestamptz": (pa.timestamp("us", tz="UTC"), {"date", "timestamp"}, True),
+}
+
+def arrow_kind(arrow_type):
+    """Coarse kind of an Arrow type, used to match it against PostgreSQL column types."""
+    if pa.types.is_dictionary(arrow_type):
+        return arrow_kind(arrow_type.value_type)
+    for kind, check in (
+        ("integer", pa.types.is_integer),
+        ("floating", pa.types.is_floating),
+        ("decimal", pa.types.is_decimal),
+        ("string", lambda t: pa.types.is_string(t) or pa.types.is_large_string(t)),
+        ("boolean", pa.types.is_boolean),
+        ("date", pa.types.is_date),
+        ("timestamp", pa.types.is_timestamp),
+        ("time", pa.types.is_time),
+        ("binary", lambda t: pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_fixed_size_binary(t)),
+    ):
+        if check(arrow_type):
+            return kind
+    return None
+
+def plan_target_schema(arrow_schema, pg_columns, primary_keys, preferred="binary", project=True):
+    """Match a parquet schema to a table's columns before any data is read.
+
+    `pg_columns` maps column name -> PostgreSQL base type name. Parquet columns
+    the table doesn't have are dropped with `project`, and are an error without
+    it; the rest are cast to the Arrow type the PostgreSQL type expects.
+    Returns (target schema, copy format) and raises ValueError listing every
+    incompatible column at once.
+    """
+    fields = []
+    problems = []
+    binary_capable = True
+
+    for key in primary_keys:
+        if key not in arrow_schema.names:
+            problems.append(f"primary key {key!r} is missing from the parquet file")
+
+    for field in arrow_schema:
+        if field.name not in pg_columns:
+            if not project:
+                problems.append(f"{field.name!r} is not a column of the target table")
+            continue
+        pg_type = pg_columns[field.name]
+        if pg_type not in PG_ARROW_TYPES:
+            problems.append(f"{field.name!r}: unsupported column type {pg_type}")
+            continue
+        target_type, accepted_kinds, binary = PG_ARROW_TYPES[pg_type]
+        if arrow_kind(field.type) not in accepted_kinds:
+            problems.append(f"{field.name!r}: cannot load parquet {field.type} into {pg_type}")
+            continue
+        if target_type is None:
+            target_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        fields.append(pa.field(field.name, target_type))
+        binary_capable = binary_capable and binary
+
+    if problems:
+        raise ValueError("Parquet schema does not match the target table: " + "; ".join(problems))
+
+    target_schema = pa.schema(fields)
+    copy_format = choose_copy_format(target_schema, preferred) if binary_capable else "text"
+    return target_schema, copy_format
+
+def cast_batch(batch, target_schema):
+    """Cast a projected RecordBatch to `target_schema`, decoding dictionaries along the way."""
+    columns = []
+    for field in target_schema:
+        column = batch.column(field.name)
+        if pa.types.is_dictionary(column.type):
+            column = column.dictionary_decode()
+        if column.type != field.type:
+            # Timestamps may legitimately lose sub-microsecond precision; other casts must be exact
+            column = pc.cast(column, field.type, safe=not pa.types.is_timestamp(field.type))
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=target_schema)
+
+def encode_text_value(value):
+    """Encode one Python value for COPY text format, escaping COPY control characters."""
+    if value is None:
+        return TEXT_NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, bytes):
+        return "\\\\x" + value.hex()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str).translate(TEXT_ESCAPES)
+    return str(value).translate(TEXT_ESCAPES)
+
+def iter_binary_chunks(batch, rows_per_chunk):
+    encoders = [binary_encoder(field.type) for field in batch.schema]
+    yield BINARY_HEADER
+    field_count = struct.pack("!h", batch.num_columns)
+    for offset in range(0, batch.num_rows, rows_per_chunk):
+        piece = batch.slice(offset, rows_per_chunk)
+        columns = [
+            [NULL_FIELD if value is None else encode(value) for value in prepare(column).to_pylist()]
+            for column, (prepare, encode) in zip(piece.columns, encoders)
+        ]
+        yield b"".join(field_count + b"".join(row) for row in zip(*columns))
+    yield BINARY_TRAILER
+
+def text_fields(column):
+    """A column as escaped COPY text fields with nulls as \\N, computed in Arrow where possible.
+
+    Strings are escaped and other scalar types cast with Arrow kernels, whose
+    output PostgreSQL parses (true/false, ISO dates and timestamps, inf/nan);
+    binary and nested values fall back to encode_text_value one at a time.
+    """
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+    arrow_type = column.type
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        fields = column.cast(pa.large_string())
+        for char, escaped in TEXT_ESCAPE_PAIRS:
+            fields = pc.replace_substring(fields, char, escaped)
+        return pc.fill_null(fields, TEXT_NULL)
+    if not (pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type)
+            or pa.types.is_fixed_size_binary(arrow_type) or pa.types.is_nested(arrow_type)):
+        try:
+            return pc.fill_null(pc.cast(column, pa.large_string()), TEXT_NULL)
+        except pa.ArrowNotImplementedError:
+            pass
+    return pa.array([encode_text_value(value) for value in column.to_pylist()], type=pa.large_string())
+
+def _string_bytes(array):
+    # The UTF-8 data of a null-free large_string array, without going through Python strings
+    offsets = np.frombuffer(array.buffers()[1], dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+    return array.buffers()[2].to_pybytes()[offsets[0]:offsets[-1]]
+
+def iter_text_chunks(batch, rows_per_chunk):
+    for offset in range(0, batch.num_rows, rows_per_chunk):
+        piece = batch.slice(offset, rows_per_chunk)
+        if piece.num_rows == 0:
+            continue
+        tab, newline, empty = (pa.scalar(text, pa.large_string()) for text in ("\t", "\n", ""))
+        rows = pc.binary_join_element_wise(*(text_fields(column) for column in piece.columns), tab)
+        lines = pc.binary_join_element_wise(rows, empty, newline)
+        yield _string_bytes(pa.concat_arrays(lines.chunks) if isinstance(lines, pa.ChunkedArray) else lines)
+
+def encode_batch(batch, copy_format="binary", rows_per_chunk=4096):
+    """Encode a whole RecordBatch into one COPY payload, e.g. ahead of time on another thread."""
+    chunks = iter_binary_chunks(batch, rows_per_chunk) if copy_format == "binary" else iter_text_chunks(batch, rows_per_chunk)
+    return b"".join(chunks)
+
+class ArrowCopyReader:
+    """File-like object that feeds an Arrow RecordBatch to `cursor.copy_expert`.
+
+    Rows are encoded lazily, `rows_per_chunk` at a time, as psycopg2 reads,
+    so no pandas DataFrame or full-batch text buffer is ever built.
+    """
+
+    def __init__(self, batch, copy_format="binary", rows_per_chunk=4096):
+        if copy_format == "binary":
+            self._chunks = iter_binary_chunks(batch, rows_per_chunk)
+        elif copy_format == "text":
+            self._chunks = iter_text_chunks(batch, rows_per_chunk)
+        else:
+            raise ValueError(f"Unsupported COPY format: {copy_format}")
+        self._buffer = bytearray()
+        self._position = 0
+
+    def tell(self):
+        """Number of payload bytes handed out so far."""
+        return self._position
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        self._position += len(data)
+        return data
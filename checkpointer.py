@@ -0,0 +1,253 @@
+import asyncio
+import threading
+import time
+from sqlalchemy import Column, Float, Integer, LargeBinary, MetaData, String, Table, delete, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from langgraph.checkpoint.base import (BaseCheckpointSaver, CheckpointTuple, WRITES_IDX_MAP, get_checkpoint_id,
+                                       get_checkpoint_metadata)
+
+# Durable LangGraph checkpointer on SQLAlchemy (SQLite locally, Postgres in
+# production). Channel values are stored once per channel version, so a step
+# only writes the channels it changed; each thread keeps its latest
+# KEEP_CHECKPOINTS checkpoints, and threads idle for THREAD_IDLE_SECONDS are
+# deleted. Nothing is held in process memory between calls.
+
+KEEP_CHECKPOINTS = 20
+THREAD_IDLE_SECONDS = 7 * 24 * 3600
+EVICT_INTERVAL_SECONDS = 600  # How often put() looks for idle threads
+
+metadata = MetaData()
+
+checkpoints = Table(
+    "agent_checkpoints", metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True),
+    Column("checkpoint_id", String, primary_key=True),  # uuid6: sorts by creation time
+    Column("parent_checkpoint_id", String),
+    Column("type", String),
+    Column("checkpoint", LargeBinary),  # Checkpoint without channel_values
+    Column("metadata_type", String),
+    Column("metadata", LargeBinary),
+    Column("created_at", Float, nullable=False, index=True),
+)
+
+blobs = Table(
+    "agent_checkpoint_blobs", metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True),
+    Column("channel", String, primary_key=True),
+    Column("version", String, primary_key=True),
+    Column("type", String),
+    Column("blob", LargeBinary),
+)
+
+writes = Table(
+    "agent_checkpoint_writes", metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("task_id", String, primary_key=True),
+    Column("idx", Integer, primary_key=True),
+    Column("channel", String),
+    Column("type", String),
+    Column("blob", LargeBinary),
+    Column("task_path", String),
+)
+
+def insert_ignore(conn, table, rows):
+    if not rows:
+        return
+    dialect_insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    conn.execute(dialect_insert(table).on_conflict_do_nothing(), rows)
+
+class SQLCheckpointer(BaseCheckpointSaver):
+    """Checkpoint saver that stores channel deltas in SQL and bounds what each thread keeps."""
+
+    def __init__(self, engine, keep_checkpoints=KEEP_CHECKPOINTS, thread_idle_seconds=THREAD_IDLE_SECONDS, serde=None):
+        super().__init__(serde=serde)
+        self.engine = engine
+        self.keep_checkpoints = keep_checkpoints
+        self.thread_idle_seconds = thread_idle_seconds
+        self.last_eviction = 0.0
+        self.eviction_lock = threading.Lock()
+        self.tables_ready = False
+        self.setup_lock = threading.Lock()
+
+    def setup(self):
+        # Tables are created on first use, so constructing a saver (e.g. at import) touches no database
+        if self.tables_ready:
+            return
+        with self.setup_lock:
+            if not self.tables_ready:
+                metadata.create_all(self.engine)
+                self.tables_ready = True
+
+    def get_tuple(self, config):
+        self.setup()
+        configurable = config["configurable"]
+        query = select(checkpoints).where(checkpoints.c.thread_id == configurable["thread_id"],
+                                          checkpoints.c.checkpoint_ns == configurable.get("checkpoint_ns", ""))
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query = query.where(checkpoints.c.checkpoint_id == checkpoint_id)
+        else:
+            query = query.order_by(checkpoints.c.checkpoint_id.desc()).limit(1)
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+            return self.load_tuple(conn, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        self.setup()
+        query = select(checkpoints).order_by(checkpoints.c.checkpoint_id.desc())
+        if config:
+            configurable = config["configurable"]
+            query = query.where(checkpoints.c.thread_id == configurable["thread_id"])
+            if "checkpoint_ns" in configurable:
+                query = query.where(checkpoints.c.checkpoint_ns == configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                query = query.where(checkpoints.c.checkpoint_id == get_checkpoint_id(config))
+        if before:
+            query = query.where(checkpoints.c.checkpoint_id < get_checkpoint_id(before))
+        if limit is not None and not filter:
+            query = query.limit(limit)
+
+        with self.engine.connect() as conn:
+            results = []
+            for row in conn.execute(query).all():
+                item = self.load_tuple(conn, row)
+                if filter and not all(item.metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                results.append(item)
+                if limit is not None and len(results) >= limit:
+                    break
+        return iter(results)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        # Only channels that changed in this step get a new blob row
+        blob_rows = []
+        for channel, version in new_versions.items():
+            value_type, value = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blob_rows.append({"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "channel": channel,
+                              "version": str(version), "type": value_type, "blob": value})
+
+        with self.engine.begin() as conn:
+            insert_ignore(conn, blobs, blob_rows)
+            insert_ignore(conn, checkpoints, [{
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+                "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+                "type": checkpoint_type, "checkpoint": checkpoint_blob,
+                "metadata_type": metadata_type, "metadata": metadata_blob, "created_at": time.time(),
+            }])
+            self.prune(conn, thread_id, checkpoint_ns)
+        self.evict_idle_threads()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes_, task_id, task_path=""):
+        self.setup()
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes_):
+            value_type, value = self.serde.dumps_typed(value)
+            rows.append({"thread_id": configurable["thread_id"], "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                         "checkpoint_id": configurable["checkpoint_id"], "task_id": task_id,
+                         "idx": WRITES_IDX_MAP.get(channel, idx), "channel": channel, "type": value_type,
+                         "blob": value, "task_path": task_path})
+        with self.engine.begin() as conn:
+            insert_ignore(conn, writes, rows)
+
+    def delete_thread(self, thread_id):
+        self.setup()
+        with self.engine.begin() as conn:
+            for table in (writes, blobs, checkpoints):
+                conn.execute(delete(table).where(table.c.thread_id == thread_id))
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in results:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes_, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes_, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def load_tuple(self, conn, row):
+        checkpoint = self.serde.loads_typed((row.type, row.checkpoint))
+        versions = {channel: str(version) for channel, version in checkpoint["channel_versions"].items()}
+        values = {}
+        if versions:
+            blob_rows = conn.execute(select(blobs).where(
+                blobs.c.thread_id == row.thread_id, blobs.c.checkpoint_ns == row.checkpoint_ns,
+                tuple_(blobs.c.channel, blobs.c.version).in_(list(versions.items())),
+            ))
+            for blob in blob_rows:
+                if blob.type != "empty":
+                    values[blob.channel] = self.serde.loads_typed((blob.type, blob.blob))
+        pending = conn.execute(select(writes).where(
+            writes.c.thread_id == row.thread_id, writes.c.checkpoint_ns == row.checkpoint_ns,
+            writes.c.checkpoint_id == row.checkpoint_id,
+        ).order_by(writes.c.task_id, writes.c.idx))
+
+        config = {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns,
+                                   "checkpoint_id": row.checkpoint_id}}
+        parent_config = {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns,
+                                          "checkpoint_id": row.parent_checkpoint_id}} if row.parent_checkpoint_id else None
+        return CheckpointTuple(
+            config=config,
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self.serde.loads_typed((row.metadata_type, row.metadata)),
+            parent_config=parent_config,
+            pending_writes=[(w.task_id, w.channel, self.serde.loads_typed((w.type, w.blob))) for w in pending],
+        )
+
+    def prune(self, conn, thread_id, checkpoint_ns):
+        # Drop checkpoints beyond the newest keep_checkpoints, then blobs no kept checkpoint refers to
+        in_thread = (checkpoints.c.thread_id == thread_id, checkpoints.c.checkpoint_ns == checkpoint_ns)
+        old_ids = conn.execute(select(checkpoints.c.checkpoint_id).where(*in_thread)
+                               .order_by(checkpoints.c.checkpoint_id.desc()).offset(self.keep_checkpoints)).scalars().all()
+        if not old_ids:
+            return
+        conn.execute(delete(writes).where(writes.c.thread_id == thread_id, writes.c.checkpoint_ns == checkpoint_ns,
+                                          writes.c.checkpoint_id.in_(old_ids)))
+        conn.execute(delete(checkpoints).where(*in_thread, checkpoints.c.checkpoint_id.in_(old_ids)))
+
+        referenced = set()
+        for row in conn.execute(select(checkpoints.c.type, checkpoints.c.checkpoint).where(*in_thread)):
+            referenced.update((channel, str(version)) for channel, version
+                              in self.serde.loads_typed((row.type, row.checkpoint))["channel_versions"].items())
+        stored = conn.execute(select(blobs.c.channel, blobs.c.version).where(
+            blobs.c.thread_id == thread_id, blobs.c.checkpoint_ns == checkpoint_ns)).all()
+        unreferenced = [tuple(key) for key in stored if tuple(key) not in referenced]
+        if unreferenced:
+            conn.execute(delete(blobs).where(blobs.c.thread_id == thread_id, blobs.c.checkpoint_ns == checkpoint_ns,
+                                             tuple_(blobs.c.channel, blobs.c.version).in_(unreferenced)))
+
+    def evict_idle_threads(self):
+        """Delete threads with no checkpoint in the last thread_idle_seconds; runs at most every EVICT_INTERVAL_SECONDS."""
+        now = time.time()
+        with self.eviction_lock:
+            if now - self.last_eviction < EVICT_INTERVAL_SECONDS:
+                return
+            self.last_eviction = now
+        idle = (select(checkpoints.c.thread_id).group_by(checkpoints.c.thread_id)
+                .having(func.max(checkpoints.c.created_at) < now - self.thread_idle_seconds))
+        with self.engine.begin() as conn:
+            idle_threads = conn.execute(idle).scalars().all()
+            for table in (writes, blobs, checkpoints):
+                if idle_threads:
+                    conn.execute(delete(table).where(table.c.thread_id.in_(idle_threads)))
@@ -1,8 +1,18 @@
-import pandas as pd
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 import psycopg2
-import sqlalchemy
-from io import StringIO
+from concurrent.futures import ProcessPoolExecutor
+from db import get_engine
+from arrow_copy import ArrowCopyReader, cast_batch, encode_batch, plan_target_schema
 
 # Database connection settings
 DB_USER = "your_user"
@@ -12,49 +22,518 @@ DB_PORT = "5432"
 DB_NAME = "your_database"
 TABLE_NAME = "your_table"
 PRIMARY_KEYS = ["your_primary_key_column"]  # Adjust this based on your table schema
+MANIFEST_TABLE = "parquet_load_manifest"  # Tracks committed batches for resumable loads
+HASH_COLUMN = "row_hash"  # Target column holding the row content hash for change_detection="hash"
+PIPELINE_DEPTH = 2  # Batches buffered between the read, encode and write stages (0 = run them in sequence)
 
-# Create SQLAlchemy engine
-engine = sqlalchemy.create_engine(f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+# SQLAlchemy engine from the shared pool (see db.py)
+DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+engine = get_engine(DATABASE_URL)
 
-def upsert_parquet_to_postgres(parquet_file, table_name, primary_keys, chunk_size=100000):
-    """Upsert parquet data into PostgreSQL efficiently in chunks, handling column name issues."""
-    
+# Engine owned by a parallel-load worker process (see init_worker)
+worker_engine = None
+
+logger = logging.getLogger(__name__)
+
+def quote_ident(name):
+    """Quote a column name for PostgreSQL, escaping embedded double quotes."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def create_staging_table(cursor, table_name, on_commit="DROP"):
+    """Create a session-local staging table shaped like the target table.
+
+    Temporary tables are never WAL-logged, so COPY into them runs at full speed.
+    By default the table is dropped when the surrounding transaction ends; pass
+    on_commit="DELETE ROWS" to keep it across per-batch commits.
+    """
+    staging_table = "staging_" + table_name.replace(".", "_").replace('"', "")
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {quote_ident(staging_table)} "
+        f"(LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT {on_commit}"
+    )
+    return quote_ident(staging_table)
+
+def build_merge_sql(staging_table, table_name, columns, primary_keys, change_detection=None):
+    """Build the set-based INSERT ... SELECT ... ON CONFLICT statement for one batch.
+
+    The statement returns a single (staged, inserted, updated) row. With
+    change_detection, rows whose content is unchanged are left alone, so they
+    produce no new tuple, WAL or index entries:
+    "compare" checks the columns against the existing row, and "hash" checks an
+    md5 of the incoming row against HASH_COLUMN stored on the target table.
+    """
+    col_names = ", ".join(quote_ident(col) for col in columns)
+    key_names = ", ".join(quote_ident(key) for key in primary_keys)
+    select_cols = [quote_ident(col) for col in columns]
+    update_cols = [col for col in columns if col not in primary_keys]
+    condition = ""
+
+    if change_detection == "hash":
+        select_cols.append(f"md5(ROW({col_names})::text) AS {quote_ident(HASH_COLUMN)}")
+        update_cols.append(HASH_COLUMN)
+        condition = f"WHERE target.{quote_ident(HASH_COLUMN)} IS DISTINCT FROM EXCLUDED.{quote_ident(HASH_COLUMN)}"
+    elif change_detection == "compare" and update_cols:
+        target_row = ", ".join(f"target.{quote_ident(col)}" for col in update_cols)
+        excluded_row = ", ".join(f"EXCLUDED.{quote_ident(col)}" for col in update_cols)
+        condition = f"WHERE ({target_row}) IS DISTINCT FROM ({excluded_row})"
+    elif change_detection not in (None, "compare"):
+        raise ValueError(f"Unsupported change_detection mode: {change_detection}")
+
+    insert_cols = ", ".join(quote_ident(col) for col in columns + ([HASH_COLUMN] if change_detection == "hash" else []))
+    if update_cols:
+        update_clause = ", ".join(f"{quote_ident(col)} = EXCLUDED.{quote_ident(col)}" for col in update_cols)
+        conflict_action = f"DO UPDATE SET {update_clause} {condition}"
+    else:
+        conflict_action = "DO NOTHING"
+
+    # DISTINCT ON keeps one row per key (the last one copied) so that
+    # duplicate keys inside a batch don't make ON CONFLICT touch a row twice.
+    # xmax = 0 on a returned row means it was freshly inserted.
+    return f"""
+        WITH source AS (
+            SELECT DISTINCT ON ({key_names}) {", ".join(select_cols)}
+            FROM {staging_table}
+            ORDER BY {key_names}, ctid DESC
+        ), merged AS (
+            INSERT INTO {table_name} AS target ({insert_cols})
+            SELECT {insert_cols} FROM source
+            ON CONFLICT ({key_names}) {conflict_action}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT (SELECT count(*) FROM source),
+               count(*) FILTER (WHERE inserted),
+               count(*) FILTER (WHERE NOT inserted)
+        FROM merged
+    """
+
+def run_merge(cursor, merge_sql, batch_rows):
+    """Execute a merge built by build_merge_sql and return its row counts."""
+    cursor.execute(merge_sql)
+    staged, inserted, updated = cursor.fetchone()
+    return Counter(rows=batch_rows, inserted=inserted, updated=updated, unchanged=staged - inserted - updated)
+
+def log_stage(stage, seconds, rows, nbytes):
+    logger.debug("%s: %d rows, %d bytes in %.3fs", stage, rows, nbytes, seconds)
+
+class StageTimings:
+    """Per-stage wall time, rows and bytes for a load (stages: read, encode, copy, merge).
+
+    Every measurement is passed to `callback(stage, seconds, rows, nbytes)` as
+    it happens (possibly from the reader/encoder threads) and summed into
+    `totals` as "<stage>_seconds", "<stage>_rows" and "<stage>_bytes".
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback or log_stage
+        self.totals = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, rows, nbytes):
+        with self._lock:
+            self.totals.update({f"{stage}_seconds": seconds, f"{stage}_rows": rows, f"{stage}_bytes": nbytes})
+        self.callback(stage, seconds, rows, nbytes)
+
+def timed_batches(batches, timings):
+    """Yield from `batches`, recording the time spent producing each one as the read stage."""
+    batches = iter(batches)
+    while True:
+        start = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            return
+        timings.record("read", time.perf_counter() - start, batch.num_rows, batch.nbytes)
+        yield batch
+
+def prefetch(items, queue_depth, transform=None):
+    """Iterate `items` (optionally applying `transform`) on a background thread.
+
+    At most `queue_depth` results wait in the queue, so a slow consumer blocks
+    the producer instead of letting memory grow. Errors in the producer are
+    re-raised in the consumer.
+    """
+    done = object()
+    buffer = queue.Queue(maxsize=queue_depth)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(transform(item) if transform else item):
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
     try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+def copy_payloads(batches, copy_format, pipeline_depth=PIPELINE_DEPTH, timings=None):
+    """Yield (row count, file object) COPY sources for each Arrow batch.
+
+    With a pipeline_depth, parquet decoding runs on a reader thread and COPY
+    encoding on an encoder thread, so both overlap with the COPY and merge of
+    the previous batch on the writer connection. Without one, encoding happens
+    lazily while COPY reads, and its time is counted in the copy stage.
+    """
+    timings = timings or StageTimings()
+    batches = timed_batches(batches, timings)
+    if not pipeline_depth:
+        for batch in batches:
+            yield batch.num_rows, ArrowCopyReader(batch, copy_format)
+        return
+
+    def encode(batch):
+        start = time.perf_counter()
+        payload = encode_batch(batch, copy_format)
+        timings.record("encode", time.perf_counter() - start, batch.num_rows, len(payload))
+        return batch.num_rows, io.BytesIO(payload)
+
+    yield from prefetch(prefetch(batches, pipeline_depth), pipeline_depth, transform=encode)
+
+def copy_and_merge(cursor, copy_sql, merge_sql, num_rows, payload, timings):
+    """COPY one payload into the staging table, merge it, and time both steps."""
+    start = time.perf_counter()
+    cursor.copy_expert(copy_sql, payload)
+    copied = time.perf_counter()
+    timings.record("copy", copied - start, num_rows, payload.tell())
+
+    batch_stats = run_merge(cursor, merge_sql, num_rows)
+    timings.record("merge", time.perf_counter() - copied, num_rows, 0)
+    return batch_stats
+
+def upsert_batches(db_engine, batches, table_name, primary_keys, columns, copy_format, change_detection=None,
+                   pipeline_depth=PIPELINE_DEPTH, timings=None, commit_each_batch=False):
+    """COPY each Arrow batch into a staging table and merge it into the target.
+
+    All batches go in one transaction unless commit_each_batch is set, in which
+    case each batch commits as soon as it is merged.
+    """
+    col_names = ", ".join(quote_ident(col) for col in columns)
+    timings = timings or StageTimings()
+    stats = Counter()
+
+    with db_engine.begin() as conn:  # Auto-commit or rollback on failure
+        with conn.connection.cursor() as cursor:  # Auto-close cursor
+            staging_table = create_staging_table(cursor, table_name, "DELETE ROWS" if commit_each_batch else "DROP")
+            copy_sql = f"COPY {staging_table} ({col_names}) FROM STDIN WITH (FORMAT {copy_format})"
+            merge_sql = build_merge_sql(staging_table, table_name, columns, primary_keys, change_detection)
+
+            for num_rows, payload in copy_payloads(batches, copy_format, pipeline_depth, timings):
+                # Fast bulk load into the staging table, never the target,
+                # then one set-based upsert per batch
+                cursor.execute(f"TRUNCATE {staging_table}")
+                stats.update(copy_and_merge(cursor, copy_sql, merge_sql, num_rows, payload, timings))
+                if commit_each_batch:
+                    conn.connection.commit()  # Release this batch's row locks before taking the next one's
+
+            if commit_each_batch:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+
+    stats.update(timings.totals)
+    return stats
+
+def get_table_columns(db_engine, table_name):
+    """Return {column name: PostgreSQL base type name} for a table, in column order."""
+    with db_engine.connect() as conn:
+        with conn.connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT a.attname, t.typname
+                FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+                ORDER BY a.attnum
+                """,
+                (table_name,),
+            )
+            return dict(cursor.fetchall())
+
+def plan_load(db_engine, parquet_file, table_name, primary_keys, copy_format, project_columns):
+    """Decide the target Arrow schema and COPY format for a load.
+
+    The target table's column types are read once (one catalog query), so
+    schema mismatches raise here, before any data is read or written, and
+    binary COPY is only chosen when every column is cast to the Arrow type its
+    PostgreSQL type expects. project_columns only decides what happens to
+    parquet columns the table lacks: skipped with it, an error without it.
+    """
+    pg_columns = get_table_columns(db_engine, table_name)
+    return plan_target_schema(parquet_file.schema_arrow, pg_columns, primary_keys, preferred=copy_format,
+                              project=project_columns)
+
+def read_batches(parquet_file, chunk_size, row_groups=None, target_schema=None):
+    """Iterate parquet batches, reading only the target schema's columns and casting to it."""
+    if target_schema is None:
+        yield from parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups)
+        return
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=target_schema.names):
+        yield cast_batch(batch, target_schema)
+
+def file_fingerprint(path, footer_bytes=1 << 20):
+    """Identify a parquet file by its size and footer (schema, row group offsets and stats)."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        f.seek(max(0, size - footer_bytes))
+        digest.update(f.read())
+    return digest.hexdigest()
+
+def ensure_manifest_table(db_engine):
+    with db_engine.begin() as conn:
+        with conn.connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                    file_fingerprint TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    row_group INTEGER NOT NULL,
+                    batch_offset BIGINT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (file_fingerprint, table_name, row_group, batch_offset)
+                )
+            """)
+
+def record_batch(cursor, fingerprint, table_name, row_group, batch_offset, row_count, status, error=None):
+    cursor.execute(
+        f"""
+        INSERT INTO {MANIFEST_TABLE} (file_fingerprint, table_name, row_group, batch_offset, row_count, status, error)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (file_fingerprint, table_name, row_group, batch_offset)
+        DO UPDATE SET row_count = EXCLUDED.row_count, status = EXCLUDED.status,
+                      error = EXCLUDED.error, updated_at = now()
+        """,
+        (fingerprint, table_name, row_group, batch_offset, row_count, status, error),
+    )
+
+def upsert_row_groups_resumable(db_engine, parquet_path, row_groups, table_name, primary_keys, chunk_size, copy_format,
+                                change_detection=None, pipeline_depth=PIPELINE_DEPTH, timings=None, target_schema=None):
+    """Load row groups one batch per transaction, skipping batches the manifest marks committed.
+
+    Each batch's merge and its manifest row commit together, so after a crash
+    a rerun resumes right after the last committed batch.
+    Returns the row counts for the batches loaded by this call.
+    """
+    parquet_file = pq.ParquetFile(parquet_path)
+    fingerprint = file_fingerprint(parquet_path)
+    columns = (target_schema or parquet_file.schema_arrow).names
+    col_names = ", ".join(quote_ident(col) for col in columns)
+    timings = timings or StageTimings()
+    stats = Counter()
+
+    raw_conn = db_engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT row_group, batch_offset, row_count FROM {MANIFEST_TABLE} "
+                "WHERE file_fingerprint = %s AND table_name = %s AND status = 'committed'",
+                (fingerprint, table_name),
+            )
+            committed = {(row_group, offset): count for row_group, offset, count in cursor.fetchall()}
+
+            staging_table = create_staging_table(cursor, table_name, on_commit="DELETE ROWS")
+            raw_conn.commit()
+            copy_sql = f"COPY {staging_table} ({col_names}) FROM STDIN WITH (FORMAT {copy_format})"
+            merge_sql = build_merge_sql(staging_table, table_name, columns, primary_keys, change_detection)
+
+            for row_group in row_groups:
+                # Skip the whole row group without decoding it when every batch is already in
+                group_rows = parquet_file.metadata.row_group(row_group).num_rows
+                offsets = range(0, group_rows, chunk_size)
+                if all((row_group, offset) in committed for offset in offsets):
+                    continue
+
+                batches = read_batches(parquet_file, chunk_size, [row_group], target_schema)
+                for batch_index, (num_rows, payload) in enumerate(copy_payloads(batches, copy_format, pipeline_depth, timings)):
+                    batch_offset = batch_index * chunk_size
+                    if committed.get((row_group, batch_offset)) == num_rows:
+                        continue
+
+                    try:
+                        batch_stats = copy_and_merge(cursor, copy_sql, merge_sql, num_rows, payload, timings)
+                        record_batch(cursor, fingerprint, table_name, row_group, batch_offset, num_rows, "committed")
+                        raw_conn.commit()
+                    except Exception as e:
+                        raw_conn.rollback()
+                        try:
+                            record_batch(cursor, fingerprint, table_name, row_group, batch_offset, num_rows, "failed", str(e))
+                            raw_conn.commit()
+                        except Exception:
+                            pass  # The connection itself may be gone; the original error matters more
+                        raise
+                    stats.update(batch_stats)
+
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            raw_conn.commit()
+    finally:
+        raw_conn.close()
+
+    stats.update(timings.totals)
+    return stats
+
+def upsert_parquet_to_postgres(parquet_file, table_name, primary_keys, chunk_size=100000, copy_format="binary", resumable=False,
+                               change_detection=None, pipeline_depth=PIPELINE_DEPTH, on_stage=None, project_columns=False):
+    """Upsert parquet data into PostgreSQL efficiently in chunks via a staging table.
+
+    Arrow batches are streamed straight into COPY, cast to the Arrow type
+    matching each target column's PostgreSQL type (see plan_load). Binary
+    format is used when every column type supports it, otherwise text format.
+    With resumable=True every batch commits on its own and is recorded in
+    MANIFEST_TABLE, so rerunning after a failure skips the committed batches.
+    change_detection ("compare" or "hash", see build_merge_sql) skips rewriting
+    rows that did not change.
+    pipeline_depth bounds how many batches are read and encoded ahead of the
+    one being written (see copy_payloads); 0 runs the stages in sequence.
+    on_stage(stage, seconds, rows, nbytes) is called for every read, encode,
+    copy and merge step (see StageTimings); by default steps are logged at DEBUG.
+    With project_columns only the columns the target table has are read;
+    without it every parquet column must exist in the table. An incompatible
+    schema raises ValueError before anything is loaded.
+    Returns a Counter of rows read, rows inserted, updated and unchanged, and
+    the per-stage totals.
+    """
+
+    try:
+        parquet_path = parquet_file
         parquet_file = pq.ParquetFile(parquet_file)
-        
-        with engine.begin() as conn:  # Auto-commit or rollback on failure
-            with conn.connection.cursor() as cursor:  # Auto-close cursor
+        target_schema, copy_format = plan_load(engine, parquet_file, table_name, primary_keys, copy_format, project_columns)
+        timings = StageTimings(on_stage)
+
+        if resumable:
+            ensure_manifest_table(engine)
+            row_groups = range(parquet_file.num_row_groups)
+            return upsert_row_groups_resumable(engine, parquet_path, row_groups, table_name, primary_keys, chunk_size, copy_format,
+                                               change_detection, pipeline_depth, timings, target_schema)
+
+        columns = (target_schema or parquet_file.schema_arrow).names
+        batches = read_batches(parquet_file, chunk_size, target_schema=target_schema)
+        return upsert_batches(engine, batches, table_name, primary_keys, columns, copy_format, change_detection, pipeline_depth,
+                              timings)
+
+    except Exception as e:
+        print(f"Error occurred: {e}")  # Log error
+        raise  # Re-raise exception after logging
+
+def key_ranges_disjoint(parquet_file, key):
+    """True if row group statistics prove no value of `key` is in two row groups; False if unknown."""
+    metadata = parquet_file.metadata
+    index = parquet_file.schema_arrow.get_field_index(key)
+    ranges = []
+    for row_group in range(metadata.num_row_groups):
+        stats = metadata.row_group(row_group).column(index).statistics
+        if stats is None or not stats.has_min_max:
+            return False
+        ranges.append((stats.min, stats.max))
+    ranges.sort()
+    return all(previous[1] < current[0] for previous, current in zip(ranges, ranges[1:]))
 
-                for batch in parquet_file.iter_batches(batch_size=chunk_size):
-                    df = batch.to_pandas()
+def row_groups_share_keys(parquet_file, primary_keys):
+    """True if some primary key appears in more than one row group of the file.
 
-                    # Convert DataFrame to CSV format for bulk insert
-                    output = StringIO()
-                    df.to_csv(output, sep="\t", index=False, header=False)
-                    output.seek(0)
+    Disjoint key ranges in the row group statistics settle it without reading
+    any data; otherwise only the key columns are read.
+    """
+    if parquet_file.num_row_groups < 2:
+        return False
+    if len(primary_keys) == 1 and key_ranges_disjoint(parquet_file, primary_keys[0]):
+        return False
+    keys = []
+    for row_group in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(row_group, columns=primary_keys)
+        keys.append(table.append_column("row_group", pa.array([row_group] * table.num_rows, pa.int32())))
+    groups = pa.concat_tables(keys).group_by(primary_keys).aggregate([("row_group", "count_distinct")])
+    return pc.max(groups["row_group_count_distinct"]).as_py() > 1
 
-                    # Fast bulk insert using COPY FROM
-                    cursor.copy_from(output, table_name, sep="\t", null="")
+def init_worker(database_url):
+    """Give each worker process its own single-connection pool."""
+    global worker_engine
+    engine.dispose(close=False)  # Connections inherited through fork belong to the parent; never use or close them here
+    worker_engine = get_engine(database_url, pool_size=1, max_overflow=0)
 
-                    # **Fix: Enclose column names in double quotes**
-                    col_names = ", ".join(f'"{col}"' for col in df.columns)
-                    key_names = ", ".join(f'"{key}"' for key in primary_keys)
-                    update_clause = ", ".join([f'"{col}" = EXCLUDED."{col}"' for col in df.columns if col not in primary_keys])
+def upsert_row_group(parquet_path, row_group, table_name, primary_keys, chunk_size, copy_format, resumable=False,
+                     change_detection=None, pipeline_depth=PIPELINE_DEPTH, target_schema=None):
+    """Worker task: load one row group through the worker's own connection and staging table."""
+    if resumable:
+        return upsert_row_groups_resumable(worker_engine, parquet_path, [row_group], table_name, primary_keys, chunk_size,
+                                           copy_format, change_detection, pipeline_depth, target_schema=target_schema)
 
-                    # Perform upsert
-                    values_placeholder = ", ".join(["%s"] * len(df.columns))  # Placeholder for values
+    parquet_file = pq.ParquetFile(parquet_path)
+    batches = read_batches(parquet_file, chunk_size, [row_group], target_schema)
+    columns = (target_schema or parquet_file.schema_arrow).names
+    return upsert_batches(worker_engine, batches, table_name, primary_keys, columns, copy_format, change_detection,
+                          pipeline_depth, commit_each_batch=True)
+
+def parallel_upsert_parquet_to_postgres(parquet_path, table_name, primary_keys, workers=4, chunk_size=100000,
+                                        copy_format="binary", resumable=False, change_detection=None,
+                                        pipeline_depth=PIPELINE_DEPTH, project_columns=False):
+    """Upsert a parquet file by spreading its row groups over `workers` processes.
+
+    Workers commit after every batch, so a failure leaves the batches that
+    already finished in place; with resumable=True those commits are also
+    recorded in MANIFEST_TABLE, as in upsert_parquet_to_postgres, which
+    describes the other options.
+    Each merge inserts its rows in key order, which only orders locks within
+    one statement; committing per batch keeps a worker from holding one
+    batch's row locks while it waits for another's, so row groups that share
+    keys cannot deadlock across batches.
+    Row groups run in no fixed order, so when a key appears in more than one
+    row group the row that ends up in the table would depend on which worker
+    commits last; such files are detected up front (see row_groups_share_keys)
+    and loaded with upsert_parquet_to_postgres instead, where the last row in
+    file order wins.
+    Returns the summed row counts and stage totals of all workers; stage
+    seconds are therefore summed across workers, not wall time.
+    """
+
+    try:
+        parquet_file = pq.ParquetFile(parquet_path)
+        if row_groups_share_keys(parquet_file, primary_keys):
+            logger.warning("Keys repeat across row groups of %s; loading it serially", parquet_path)
+            return upsert_parquet_to_postgres(parquet_path, table_name, primary_keys, chunk_size, copy_format, resumable,
+                                              change_detection, pipeline_depth, project_columns=project_columns)
+        target_schema, copy_format = plan_load(engine, parquet_file, table_name, primary_keys, copy_format, project_columns)
+        row_groups = range(parquet_file.num_row_groups)
+        if resumable:
+            ensure_manifest_table(engine)
 
-                    sql_query = f"""
-                        INSERT INTO {table_name} ({col_names}) 
-                        VALUES {', '.join(str(tuple(row)) for row in df.itertuples(index=False))}
-                        ON CONFLICT ({key_names}) DO UPDATE SET {update_clause}
-                    """
-                    cursor.execute(sql_query)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(DATABASE_URL,)) as pool:
+            futures = [
+                pool.submit(upsert_row_group, parquet_path, row_group, table_name, primary_keys, chunk_size, copy_format,
+                            resumable=resumable, change_detection=change_detection, pipeline_depth=pipeline_depth,
+                            target_schema=target_schema)
+                for row_group in row_groups
+            ]
+            stats = Counter()
+            for future in futures:
+                stats.update(future.result())
+            return stats
 
     except Exception as e:
         print(f"Error occurred: {e}")  # Log error
         raise  # Re-raise exception after logging
 
-# Example usage
-parquet_file_path = "your_file.parquet"
-upsert_parquet_to_postgres(parquet_file_path, TABLE_NAME, PRIMARY_KEYS)
+if __name__ == "__main__":
+    # Example usage
+    parquet_file_path = "your_file.parquet"
+    stats = upsert_parquet_to_postgres(parquet_file_path, TABLE_NAME, PRIMARY_KEYS, change_detection="compare",
+                                       project_columns=True)
+    print(f"Inserted {stats['inserted']}, updated {stats['updated']}, unchanged {stats['unchanged']}")
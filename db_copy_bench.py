@@ -0,0 +1,162 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlalchemy
+import db_copy
+from db import get_engine, pool_metrics
+from arrow_copy import choose_copy_format, encode_batch
+
+# Benchmark harness for db_copy: builds a synthetic parquet file and reports
+# rows/s, MB/s and the highest RSS sampled during each of the read, encode,
+# copy and merge stages.
+#
+#   python db_copy_bench.py --rows 1000000 --columns int64:4,string:4,timestamp:1 --duplicates 0.2
+#   python db_copy_bench.py --database-url postgresql+psycopg2://user:pw@localhost/bench
+#
+# Without --database-url only the read and encode stages run, since COPY and
+# the ON CONFLICT merge need a real PostgreSQL server.
+
+BENCH_TABLE = "db_copy_bench"
+
+PG_TYPES = {
+    "int64": "BIGINT",
+    "float64": "DOUBLE PRECISION",
+    "string": "TEXT",
+    "timestamp": "TIMESTAMP",
+    "bool": "BOOLEAN",
+}
+
+def parse_columns(spec):
+    """Turn "int64:2,string:3" into [("int64_0", "int64"), ("int64_1", "int64"), ("string_0", "string"), ...]."""
+    columns = []
+    for part in spec.split(","):
+        type_name, _, count = part.partition(":")
+        if type_name not in PG_TYPES:
+            raise ValueError(f"Unsupported column type: {type_name}")
+        columns += [(f"{type_name}_{i}", type_name) for i in range(int(count or 1))]
+    return columns
+
+def random_column(rng, type_name, rows):
+    if type_name == "int64":
+        return pa.array(rng.integers(0, 1 << 40, rows))
+    if type_name == "float64":
+        return pa.array(rng.random(rows))
+    if type_name == "string":
+        return pa.array([f"value-{n}\twith\\escapes" if n % 97 == 0 else f"value-{n}" for n in rng.integers(0, 1 << 20, rows)])
+    if type_name == "timestamp":
+        return pa.array(rng.integers(1_500_000_000_000_000, 1_700_000_000_000_000, rows), type=pa.timestamp("us"))
+    return pa.array(rng.random(rows) < 0.5)
+
+def generate_parquet(path, rows, columns, duplicates=0.0, row_group_size=100000, seed=0):
+    """Write a synthetic parquet file; `duplicates` is the fraction of rows that reuse an earlier key."""
+    rng = np.random.default_rng(seed)
+    unique_keys = max(1, int(rows * (1 - duplicates)))
+    keys = np.concatenate([np.arange(unique_keys), rng.integers(0, unique_keys, rows - unique_keys)])
+    rng.shuffle(keys)
+
+    arrays = {"id": pa.array(keys)}
+    for name, type_name in columns:
+        arrays[name] = random_column(rng, type_name, rows)
+    pq.write_table(pa.table(arrays), path, row_group_size=row_group_size)
+
+def create_target_table(db_engine, columns, change_detection=None):
+    col_defs = ", ".join(f"{db_copy.quote_ident(name)} {PG_TYPES[type_name]}" for name, type_name in columns)
+    if change_detection == "hash":
+        col_defs += f", {db_copy.quote_ident(db_copy.HASH_COLUMN)} TEXT"  # Where the merge keeps each row's md5
+    with db_engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        conn.execute(sqlalchemy.text(f"CREATE TABLE {BENCH_TABLE} (id BIGINT PRIMARY KEY, {col_defs})"))
+
+def rss_mb():
+    """Current resident set size (not the process high-water mark); Linux only."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+class StageRss:
+    """Highest RSS sampled at the end of each step of a stage; usable as an on_stage callback."""
+
+    def __init__(self):
+        self.peaks = {}
+
+    def __call__(self, stage, seconds=0.0, rows=0, nbytes=0):
+        self.peaks[stage] = max(self.peaks.get(stage, 0.0), rss_mb())
+
+def report(stage, rows, nbytes, seconds, rss):
+    seconds = max(seconds, 1e-9)
+    print(f"{stage:<8} {rows / seconds:>14,.0f} rows/s {nbytes / seconds / 1e6:>10,.1f} MB/s "
+          f"{seconds:>9.3f}s  stage RSS {rss:,.0f} MB")
+
+def bench_read_and_encode(path, chunk_size, copy_format):
+    """Measure the database-free stages on their own."""
+    parquet_file = pq.ParquetFile(path)
+    copy_format = choose_copy_format(parquet_file.schema_arrow, preferred=copy_format)
+    stage_rss = StageRss()
+
+    rows = nbytes = 0
+    start = time.perf_counter()
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        rows += batch.num_rows
+        nbytes += batch.nbytes
+        stage_rss("read")
+    report("read", rows, nbytes, time.perf_counter() - start, stage_rss.peaks.get("read", rss_mb()))
+
+    rows = nbytes = 0
+    encode_seconds = 0.0
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        start = time.perf_counter()
+        nbytes += len(encode_batch(batch, copy_format))
+        encode_seconds += time.perf_counter() - start
+        rows += batch.num_rows
+        stage_rss("encode")
+    report("encode", rows, nbytes, encode_seconds, stage_rss.peaks.get("encode", rss_mb()))
+
+def bench_load(path, columns, database_url, chunk_size, copy_format, pipeline_depth, change_detection):
+    db_copy.engine = get_engine(database_url)
+    create_target_table(db_copy.engine, columns, change_detection)
+
+    stage_rss = StageRss()  # Pipelined stages overlap, so each sample also holds batches of the other stages
+    start = time.perf_counter()
+    stats = db_copy.upsert_parquet_to_postgres(path, BENCH_TABLE, ["id"], chunk_size=chunk_size, copy_format=copy_format,
+                                               pipeline_depth=pipeline_depth, change_detection=change_detection,
+                                               on_stage=stage_rss)
+    elapsed = time.perf_counter() - start
+
+    for stage in ("read", "encode", "copy", "merge"):
+        if stats[f"{stage}_rows"]:
+            report(stage, stats[f"{stage}_rows"], stats[f"{stage}_bytes"], stats[f"{stage}_seconds"], stage_rss.peaks[stage])
+    report("total", stats["rows"], os.path.getsize(path), elapsed, max(stage_rss.peaks.values(), default=rss_mb()))
+    print(f"inserted {stats['inserted']:,}, updated {stats['updated']:,}, unchanged {stats['unchanged']:,}")
+    print(f"pool: {pool_metrics(db_copy.engine)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark db_copy.upsert_parquet_to_postgres")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--columns", default="int64:2,float64:2,string:2,timestamp:1,bool:1")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of rows reusing an earlier key")
+    parser.add_argument("--row-group-size", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--copy-format", choices=["binary", "text"], default="binary")
+    parser.add_argument("--pipeline-depth", type=int, default=db_copy.PIPELINE_DEPTH)
+    parser.add_argument("--change-detection", choices=["compare", "hash"], default=None)
+    parser.add_argument("--database-url", help="PostgreSQL URL; the copy and merge stages are skipped without it")
+    args = parser.parse_args()
+
+    columns = parse_columns(args.columns)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.parquet")
+        start = time.perf_counter()
+        generate_parquet(path, args.rows, columns, args.duplicates, args.row_group_size)
+        print(f"generated {args.rows:,} rows ({os.path.getsize(path) / 1e6:,.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+        bench_read_and_encode(path, args.chunk_size, args.copy_format)
+        if args.database_url:
+            bench_load(path, columns, args.database_url, args.chunk_size, args.copy_format, args.pipeline_depth,
+                       args.change_detection)
+
+if __name__ == "__main__":
+    main()
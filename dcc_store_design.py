@@ -2,14 +2,22 @@ import dash
 import dash_mantine_components as dmc
 import dash_ag_grid as dag
 import plotly.express as px
+import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 import psycopg2
 import os
 import json
-from dash import dcc, html, Input, Output, ctx
+import hashlib
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dash import dcc, html, Input, Output, State, ctx
 from flask import Flask, session
 from flask_session import Session
-from datetime import datetime
+from datetime import datetime, timedelta
+from db import get_engine
 
 # Flask App for session management
 server = Flask(__name__)
@@ -30,32 +38,382 @@ DB_CONFIG = {
     "port": "your_port"
 }
 
+TABLE_NAME = "your_table"
+QUERY = f"SELECT * FROM {TABLE_NAME}"  # Adjust query as needed
+
+# Grid columns served by SQL paging; only these may be sorted or filtered
+GRID_COLUMNS = ["column1", "column2"]
+PAGE_SIZE = 10
+COLUMN_DEFS = [{"headerName": col.capitalize(), "field": col, "filter": "agTextColumnFilter"} for col in GRID_COLUMNS]
+
+# AgGrid text filter type -> ILIKE pattern around the (escaped) filter text
+TEXT_FILTER_PATTERNS = {"contains": "%{}%", "startsWith": "{}%", "endsWith": "%{}", "equals": "{}"}
+
+# Suggested trigram indexes so ILIKE '%text%' filters use an index instead of a full scan
+FILTER_INDEX_SQL = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f'CREATE INDEX IF NOT EXISTS {TABLE_NAME}_{col}_trgm ON {TABLE_NAME} USING gin (("{col}"::text) gin_trgm_ops)'
+    for col in GRID_COLUMNS
+]
+
+# Chart rendering: figures never carry more than CHART_MAX_POINTS points or
+# DENSITY_BINS x DENSITY_BINS cells, however many rows match
+CHART_X, CHART_Y = "column1", "column2"
+CHART_MODE = "density"  # "density" (zoomable 2D histogram) or "lttb" (downsampled line-shaped data)
+CHART_MAX_POINTS = 5000
+WEBGL_THRESHOLD = 1000  # Use scattergl above this many points
+DENSITY_BINS = 200
+
+# Datasets up to this many rows are filtered and charted in the browser
+CLIENTSIDE_MAX_ROWS = 20000
+FILTER_DEBOUNCE_MS = 300
+
+# In-memory substring index for the "Filter Data" box
+FILTER_COLUMNS = ["column1"]
+NGRAM_SIZE = 3             # Shorter filter strings fall back to a scan
+INDEX_COMPACT_RATIO = 0.2  # Rebuild once this fraction of rows changed since the last build
+
+# Server-side dataset cache settings
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "dcc_store_cache")
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # In-memory budget; evicted datasets stay on disk
+
+# Incremental refresh settings: rows must bump WATERMARK_COLUMN on every change,
+# and deletes must be soft deletes that set DELETED_COLUMN (tombstones)
+KEY_COLUMN = "id"
+WATERMARK_COLUMN = "updated_at"  # None = reload the full query on every refresh
+DELETED_COLUMN = "deleted_at"    # None = the table has no tombstones
+REFRESH_INTERVAL_SECONDS = 300
+WATERMARK_OVERLAP = timedelta(seconds=60)
+
+# Shared connection pool (see db.py); close() hands connections back to the pool
+db_engine = get_engine("postgresql+psycopg2://", creator=lambda: psycopg2.connect(**DB_CONFIG))
+
 # Function to load data from PostgreSQL
-def fetch_data():
-    conn = psycopg2.connect(**DB_CONFIG)
-    query = "SELECT * FROM your_table"  # Adjust query as needed
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df.to_dict("records")
+def fetch_data(query=QUERY, params=None):
+    conn = db_engine.raw_connection()
+    try:
+        return pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+
+def ensure_filter_indexes():
+    conn = db_engine.raw_connection()
+    try:
+        with conn, conn.cursor() as cursor:
+            for statement in FILTER_INDEX_SQL:
+                cursor.execute(statement)
+    finally:
+        conn.close()
+
+def like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def build_rows_query(request):
+    """Translate an AgGrid getRowsRequest (window, sortModel, filterModel) into one SQL query over QUERY.
+
+    Rows come from the same query (and skip the same tombstones) as the cached
+    chart data; PostgreSQL flattens the subquery, so the trigram indexes still apply.
+    """
+    where, params = [], []
+    if DELETED_COLUMN:
+        where.append(f'"{DELETED_COLUMN}" IS NULL')
+    for col, model in (request.get("filterModel") or {}).items():
+        pattern = TEXT_FILTER_PATTERNS.get(model.get("type"))
+        if col in GRID_COLUMNS and pattern and model.get("filter") not in (None, ""):
+            where.append(f'"{col}"::text ILIKE %s')
+            params.append(pattern.format(like_escape(str(model["filter"]))))
+
+    # Sorted columns first, then the unique key as tie-breaker so OFFSET pages don't overlap
+    order = []
+    for sort in request.get("sortModel") or []:
+        if sort.get("colId") in GRID_COLUMNS:
+            order.append((sort["colId"], "DESC" if sort.get("sort") == "desc" else "ASC"))
+    order += [(KEY_COLUMN, "ASC")] if KEY_COLUMN not in dict(order) else []
+
+    start, end = request.get("startRow", 0), request.get("endRow", PAGE_SIZE)
+    col_names = ", ".join(f'"{col}"' for col in GRID_COLUMNS)
+    sql = f"SELECT {col_names} FROM ({QUERY}) AS source"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + ", ".join(f'"{col}" {direction}' for col, direction in order)
+    sql += " LIMIT %s OFFSET %s"
+    return sql, params + [end - start, start]
+
+def fetch_rows(request):
+    sql, params = build_rows_query(request)
+    conn = db_engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [dict(zip(GRID_COLUMNS, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def merge_changes(df, changes):
+    """Apply rows fetched since the watermark: replace changed rows by key, drop tombstones.
+
+    Returns (merged, removed labels, added rows). Kept rows keep their index
+    labels and added rows get new ones, so indexes can be updated in place.
+    """
+    if changes.empty:
+        return df, df.index[:0], changes
+    replaced = df[KEY_COLUMN].isin(changes[KEY_COLUMN])
+    if DELETED_COLUMN:
+        changes = changes[changes[DELETED_COLUMN].isna()]
+    first_label = int(df.index.max()) + 1 if len(df) else 0
+    changes = changes.set_axis(range(first_label, first_label + len(changes)))
+    return pd.concat([df[~replaced], changes]), df.index[replaced], changes
+
+def drop_unchanged(df, changes):
+    """Rows of `changes` that are new or differ from the cached row with the same key.
+
+    The watermark overlap re-fetches rows already merged (at least the one that
+    set the watermark), so most refreshes would otherwise rewrite an unchanged frame.
+    Tombstones for keys that are not cached (already dropped) change nothing either.
+    """
+    if changes.empty:
+        return changes
+    if DELETED_COLUMN:
+        changes = changes[changes[DELETED_COLUMN].isna() | changes[KEY_COLUMN].isin(df[KEY_COLUMN])]
+    if changes.empty or df.empty or list(changes.columns) != list(df.columns):
+        return changes
+    # Only live rows can equal a cached row; compare them on every other column, as
+    # objects where the dtypes differ (e.g. a column that was all NULL in one fetch)
+    live = changes[changes[DELETED_COLUMN].isna()] if DELETED_COLUMN else changes
+    compare = [col for col in changes.columns if col != DELETED_COLUMN]
+    live, cached = live[compare], df.loc[df[KEY_COLUMN].isin(live[KEY_COLUMN]), compare]
+    mismatched = {col: object for col in compare if live[col].dtype != cached[col].dtype}
+    identical = live.astype(mismatched).reset_index().merge(cached.astype(mismatched), on=compare)["index"]
+    return changes.drop(index=identical)
+
+def advance_watermark(watermark, changes):
+    """High-water mark after seeing `changes`, tombstones included; it never moves back."""
+    newest = changes[WATERMARK_COLUMN].max() if not changes.empty else None
+    if newest is None or pd.isna(newest):
+        return watermark
+    if isinstance(newest, pd.Timestamp):
+        newest = newest.to_pydatetime()
+    return newest if watermark is None else max(watermark, newest)
+
+def ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+def normalize_text(values):
+    return values.fillna("").astype(str).str.lower()
+
+class NgramIndex:
+    """Trigram index over one column, mapping each trigram to the row labels containing it.
+
+    A substring search intersects the posting lists of the query's trigrams,
+    starting from the rarest, and only checks the surviving candidates, so it
+    costs about the size of the result rather than the size of the table.
+    Rows changed by a refresh go into small added/removed deltas on top of the
+    sorted arrays built by rebuild(); updated() never mutates an index that a
+    concurrent search may be using.
+    """
+
+    def __init__(self, values):
+        self.values = normalize_text(values)
+        self.rebuild()
+
+    def rebuild(self):
+        postings = defaultdict(list)
+        for label, text in self.values.items():
+            for gram in ngrams(text):
+                postings[gram].append(label)
+        self.postings = {gram: np.sort(np.array(labels, dtype=np.int64)) for gram, labels in postings.items()}
+        self.added = {}
+        self.added_rows = 0
+        self.removed = set()
+
+    def updated(self, removed_labels, added_values):
+        index = NgramIndex.__new__(NgramIndex)
+        added_values = normalize_text(added_values)
+        index.values = pd.concat([self.values.drop(removed_labels), added_values])
+        index.postings = self.postings
+        index.added = {gram: set(labels) for gram, labels in self.added.items()}
+        index.added_rows = self.added_rows + len(added_values)
+        # A label freed by a tombstone can be handed to a new row; it is live again, and
+        # stale base postings for it are filtered out by the final check against values
+        index.removed = (self.removed | set(removed_labels)) - set(added_values.index)
+        for label, text in added_values.items():
+            for gram in ngrams(text):
+                index.added.setdefault(gram, set()).add(label)
+
+        if len(index.removed) + index.added_rows > INDEX_COMPACT_RATIO * max(1, len(index.values)):
+            index.rebuild()
+        return index
+
+    def search(self, text):
+        """Return the labels of rows containing `text` (case-insensitive), or None if it's too short to index."""
+        text = text.lower()
+        grams = ngrams(text)
+        if not grams:
+            return None
+
+        base, extra = None, None
+        for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            postings = self.postings.get(gram, np.empty(0, dtype=np.int64))
+            base = postings if base is None else np.intersect1d(base, postings, assume_unique=True)
+            added = self.added.get(gram, set())
+            extra = set(added) if extra is None else extra & added
+            if not len(base) and not extra:
+                break
+
+        # A reused label can be in both the stale base postings and the deltas; take it from the deltas
+        candidates = [label for label in base.tolist() if label not in self.removed and label not in extra]
+        candidates += [label for label in extra if label not in self.removed]
+        values = self.values.loc[candidates]
+        return values.index[values.str.contains(text, regex=False)]
+
+class DatasetCache:
+    """Query results kept on the server: an in-memory LRU in front of Parquet files on local disk.
+
+    Each dataset remembers its high-water mark (the largest WATERMARK_COLUMN
+    value seen) and refresh() fetches only rows changed since then. The browser
+    only keeps the version of the dataset it is showing; the rows themselves
+    never leave the server.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.entries = OrderedDict()  # key -> {"df", "indexes", "size", "version", "watermark", "refreshed_at"}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, query):
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, query):
+        """Return (version, DataFrame), loading from memory, then disk, then PostgreSQL."""
+        entry = self.entry(query)
+        return entry["version"], entry["df"]
+
+    def entry(self, query):
+        key = self.key(query)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        path = self.path(key)
+        if os.path.exists(path):
+            # Refresh soon: the file may be older than the refresh interval
+            return self.remember(key, pd.read_parquet(path), refreshed_at=0)
+        return self.reload(query)
+
+    def filter(self, query, column, text):
+        """Rows of the cached dataset whose `column` contains `text`, case-insensitively."""
+        entry = self.entry(query)
+        df = entry["df"]
+        index = entry["indexes"].get(column)
+        labels = index.search(text) if index is not None else None
+        if labels is None:
+            return df[df[column].astype(str).str.contains(text, case=False, na=False, regex=False)]
+        return df.loc[labels]
+
+    def refresh(self, query):
+        """Merge rows changed since the watermark if the refresh interval has passed; return (version, DataFrame)."""
+        self.get(query)
+        key = self.key(query)
+        with self.refresh_lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.reload(query)
+            elif time.time() - entry["refreshed_at"] >= self.refresh_interval:
+                if WATERMARK_COLUMN is None or entry["watermark"] is None:
+                    entry = self.reload(query)
+                else:
+                    since = entry["watermark"]
+                    if isinstance(since, datetime):
+                        since -= WATERMARK_OVERLAP  # Catch rows from transactions that committed late
+                    changes = fetch_data(f"SELECT * FROM ({query}) AS source WHERE {WATERMARK_COLUMN} > %s", [since])
+                    watermark = advance_watermark(entry["watermark"], changes)
+                    changes = drop_unchanged(entry["df"], changes)
+                    if changes.empty:
+                        # Nothing changed: keep the frame, file and indexes
+                        entry["watermark"], entry["refreshed_at"] = watermark, time.time()
+                    else:
+                        df, removed, added = merge_changes(entry["df"], changes)
+                        self.write(df, self.path(key))
+                        indexes = {col: index.updated(removed, added[col]) for col, index in entry["indexes"].items()}
+                        entry = self.remember(key, df, indexes=indexes, watermark=watermark)
+        return entry["version"], entry["df"]
+
+    def reload(self, query):
+        full_query = f"SELECT * FROM ({query}) AS source"
+        if DELETED_COLUMN:
+            full_query += f" WHERE {DELETED_COLUMN} IS NULL"
+        df = fetch_data(full_query)
+        key = self.key(query)
+        self.write(df, self.path(key))
+        return self.remember(key, df)
+
+    def write(self, df, path):
+        # Write to a temp file first so readers never see a half-written Parquet file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def remember(self, key, df, refreshed_at=None, indexes=None, watermark=None):
+        if indexes is None:
+            indexes = {col: NgramIndex(df[col]) for col in FILTER_COLUMNS if col in df.columns}
+        if watermark is None and WATERMARK_COLUMN:
+            # Live rows only: after a reload the newest tombstone is fetched (and ignored) once more
+            watermark = advance_watermark(None, df)
+        entry = {
+            "df": df,
+            "indexes": indexes,
+            "size": int(df.memory_usage(deep=True).sum()),
+            "version": hashlib.sha256(f"{key}\n{watermark}\n{len(df)}".encode("utf-8")).hexdigest()[:16],
+            "watermark": watermark,
+            "refreshed_at": time.time() if refreshed_at is None else refreshed_at,
+        }
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)["size"]
+            self.entries[key] = entry
+            self.size += entry["size"]
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted["size"]
+        return entry
+
+dataset_cache = DatasetCache()
 
 # Layout
 app.layout = dmc.Container([
-    dcc.Store(id="cached-data", storage_type="local"),  # Store data in localStorage
-    dcc.Store(id="cache-date", storage_type="local"),   # Store cache date
+    dcc.Store(id="cached-data", storage_type="local"),  # Store dataset version in localStorage (rows stay on the server)
+    dcc.Store(id="cache-date", storage_type="local"),   # Store last refresh time
+    dcc.Interval(id="refresh-interval", interval=REFRESH_INTERVAL_SECONDS * 1000),
+    dcc.Store(id="client-rows"),  # Rows of small datasets, filtered in the browser; null otherwise
+    dcc.Store(id="server-filter"),  # Filter text, forwarded here only when the server does the filtering
     
     dmc.Title("PostgreSQL Data with Caching", order=1),
     dmc.Space(h=20),
 
     dmc.Text("Filter Data:"),
-    dmc.TextInput(id="filter-text", placeholder="Type something to filter..."),
+    dmc.TextInput(id="filter-text", placeholder="Type something to filter...", debounce=FILTER_DEBOUNCE_MS),
     
     dmc.Space(h=10),
-    dag.AgGrid(
+    html.Div(id="client-table-container", style={"display": "none"}, children=dag.AgGrid(
+        id="client-table",
+        columnDefs=COLUMN_DEFS,
+        rowModelType="clientSide",  # Small datasets: all rows are in the browser and filtered there
+        dashGridOptions={"pagination": True, "paginationPageSize": PAGE_SIZE},
+    )),
+    html.Div(id="data-table-container", children=dag.AgGrid(
         id="data-table",
-        columnDefs=[{"headerName": "Column1", "field": "column1"}, {"headerName": "Column2", "field": "column2"}],  
-        rowData=[],
-        dashGridOptions={"pagination": True, "paginationPageSize": 10},
-    ),
+        columnDefs=COLUMN_DEFS,
+        rowModelType="infinite",  # Rows are requested block by block via getRowsRequest
+        dashGridOptions={"pagination": True, "paginationPageSize": PAGE_SIZE, "cacheBlockSize": PAGE_SIZE},
+    )),
     
     dmc.Space(h=20),
     dcc.Graph(id="data-chart")
@@ -65,39 +423,212 @@ app.layout = dmc.Container([
 @app.callback(
     Output("cached-data", "data"),
     Output("cache-date", "data"),
-    Input("cached-data", "data"),
-    Input("cache-date", "data"),
-    prevent_initial_call=True  # Ensures data is only fetched when needed
+    Input("refresh-interval", "n_intervals"),
+    State("cached-data", "data")
+)
+def load_data(n_intervals, cached_data):
+    # Only queries PostgreSQL (for changed rows) once per refresh interval, however many clients poll
+    version, _ = dataset_cache.refresh(QUERY)
+
+    if isinstance(cached_data, dict) and cached_data.get("version") == version:
+        return dash.no_update, dash.no_update  # Browser already shows the latest data
+    return {"version": version}, datetime.now().isoformat(timespec="seconds")
+
+@app.callback(
+    Output("data-table", "filterModel"),
+    Input("server-filter", "data")
+)
+def update_grid_filter(filter_text):
+    # The grid re-requests its rows with this filterModel, so filtering happens in SQL
+    if not filter_text:
+        return {}
+    return {"column1": {"filterType": "text", "type": "contains", "filter": filter_text}}
+
+@app.callback(
+    Output("data-table", "getRowsResponse"),
+    Input("data-table", "getRowsRequest")
+)
+def serve_rows(request):
+    if not request:
+        return dash.no_update
+
+    rows = fetch_rows(request)
+    start, end = request["startRow"], request["endRow"]
+    # A short block means we've reached the end; otherwise leave the total unknown
+    row_count = start + len(rows) if len(rows) < end - start else -1
+    return {"rowData": rows, "rowCount": row_count}
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: pick `threshold` points of an x-sorted series that keep its shape."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket = (n - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        if end >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices.append(a)
+    indices.append(n - 1)
+    return np.array(indices)
+
+def zoom_range(relayout, axis):
+    if relayout and f"{axis}.range[0]" in relayout:
+        return relayout[f"{axis}.range[0]"], relayout[f"{axis}.range[1]"]
+    return None
+
+def scatter_figure(df):
+    render_mode = "webgl" if len(df) > WEBGL_THRESHOLD else "auto"
+    return px.scatter(df, x=CHART_X, y=CHART_Y, title="Filtered Data", render_mode=render_mode)
+
+def build_figure(df, relayout=None):
+    """Scatter small results as is; bin or downsample large ones server-side."""
+    x_range, y_range = zoom_range(relayout, "xaxis"), zoom_range(relayout, "yaxis")
+    numeric = pd.api.types.is_numeric_dtype(df[CHART_X]) and pd.api.types.is_numeric_dtype(df[CHART_Y])
+    if numeric:
+        # Only the zoomed-in window is rendered, so detail appears as the user zooms
+        if x_range:
+            df = df[df[CHART_X].between(*x_range)]
+        if y_range:
+            df = df[df[CHART_Y].between(*y_range)]
+        df = df.dropna(subset=[CHART_X, CHART_Y])
+
+    if len(df) <= CHART_MAX_POINTS:
+        fig = scatter_figure(df)
+    elif not numeric:
+        fig = scatter_figure(df.sample(CHART_MAX_POINTS, random_state=0))
+    elif CHART_MODE == "lttb":
+        df = df.sort_values(CHART_X)
+        keep = lttb_indices(df[CHART_X].to_numpy(dtype=float), df[CHART_Y].to_numpy(dtype=float), CHART_MAX_POINTS)
+        fig = scatter_figure(df.iloc[keep])
+    else:
+        counts, x_edges, y_edges = np.histogram2d(df[CHART_X], df[CHART_Y], bins=DENSITY_BINS)
+        fig = go.Figure(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=np.where(counts.T > 0, counts.T, np.nan),  # Empty cells stay transparent
+            colorscale="Viridis",
+        ))
+        fig.update_layout(title=f"Filtered Data ({len(df):,} points, binned)", xaxis_title=CHART_X, yaxis_title=CHART_Y)
+
+    if x_range:
+        fig.update_xaxes(range=list(x_range))
+    if y_range:
+        fig.update_yaxes(range=list(y_range))
+    fig.update_layout(uirevision="data-chart")  # Keep the user's zoom when the figure is replaced
+    return fig
+
+def is_clientside(df):
+    return len(df) <= CLIENTSIDE_MAX_ROWS
+
+@app.callback(
+    Output("client-rows", "data"),
+    Input("cached-data", "data")
 )
-def load_data(cached_data, cache_date):
-    today = datetime.now().strftime("%Y-%m-%d")
+def load_client_rows(data):
+    # Ship the grid and chart columns once per dataset version; large datasets stay on the server
+    if not data:
+        return None
+    _, df = dataset_cache.get(QUERY)
+    if not is_clientside(df):
+        return None
+    rows = df[GRID_COLUMNS].astype(object).where(df[GRID_COLUMNS].notna(), None).to_dict("records")
+    return {"rows": rows, "x": df[CHART_X].tolist(), "y": df[CHART_Y].tolist(), "webgl_threshold": WEBGL_THRESHOLD}
 
-    if cache_date == today and cached_data:
-        return cached_data, cache_date  # Use existing cache
+# Small datasets use the in-browser grid; large ones the SQL-paged one
+app.clientside_callback(
+    """
+    function(rows) {
+        const hidden = {display: "none"};
+        return rows ? [rows.rows, {}, hidden] : [[], hidden, {}];
+    }
+    """,
+    Output("client-table", "rowData"),
+    Output("client-table-container", "style"),
+    Output("data-table-container", "style"),
+    Input("client-rows", "data")
+)
+
+# Keystrokes on small datasets never reach the server: the text only goes to
+# server-filter (and so to the SQL grid and server-side chart) without client rows
+app.clientside_callback(
+    """
+    function(filterText, rows) {
+        return rows ? window.dash_clientside.no_update : (filterText || "");
+    }
+    """,
+    Output("server-filter", "data"),
+    Input("filter-text", "value"),
+    Input("client-rows", "data")
+)
 
-    # Otherwise, fetch new data
-    data = fetch_data()
-    return data, today
+app.clientside_callback(
+    """
+    function(filterText) {
+        return filterText ? {column1: {filterType: "text", type: "contains", filter: filterText}} : {};
+    }
+    """,
+    Output("client-table", "filterModel"),
+    Input("filter-text", "value")
+)
+
+app.clientside_callback(
+    """
+    function(rows, filterText) {
+        if (!rows) {
+            return window.dash_clientside.no_update;
+        }
+        let x = rows.x, y = rows.y;
+        if (filterText) {
+            const needle = filterText.toLowerCase();
+            const keep = x.map(v => v !== null && String(v).toLowerCase().includes(needle));
+            x = x.filter((v, i) => keep[i]);
+            y = y.filter((v, i) => keep[i]);
+        }
+        return {
+            data: [{type: x.length > rows.webgl_threshold ? "scattergl" : "scatter", mode: "markers", x: x, y: y}],
+            layout: {title: {text: "Filtered Data"}, xaxis: {title: {text: "%s"}}, yaxis: {title: {text: "%s"}}, uirevision: "data-chart"}
+        };
+    }
+    """ % (CHART_X, CHART_Y),
+    Output("data-chart", "figure", allow_duplicate=True),
+    Input("client-rows", "data"),
+    Input("filter-text", "value"),
+    prevent_initial_call=True
+)
 
 @app.callback(
-    Output("data-table", "rowData"),
     Output("data-chart", "figure"),
     Input("cached-data", "data"),
-    Input("filter-text", "value")
+    Input("server-filter", "data"),
+    Input("data-chart", "relayoutData")
 )
-def update_display(data, filter_text):
+def update_display(data, filter_text, relayout):
     if not data:
-        return [], px.scatter()  # Return empty table and chart if no data
-
-    df = pd.DataFrame(data)
+        return px.scatter()  # Return empty chart if no data
+    if is_clientside(dataset_cache.get(QUERY)[1]):
+        return dash.no_update  # Small datasets are filtered and charted in the browser
 
-    # Apply filtering
+    # Apply filtering through the cached substring index
     if filter_text:
-        df = df[df["column1"].astype(str).str.contains(filter_text, case=False, na=False)]
+        df = dataset_cache.filter(QUERY, "column1", filter_text)
+    else:
+        _, df = dataset_cache.get(QUERY)
 
-    # Update table and chart
-    fig = px.scatter(df, x="column1", y="column2", title="Filtered Data")
-    return df.to_dict("records"), fig
+    # Update chart
+    return build_figure(df, relayout)
 
 if __name__ == "__main__":
+    try:
+        ensure_filter_indexes()
+    except psycopg2.Error as e:
+        print(f"Could not create filter indexes ({e}); suggested DDL:\n" + ";\n".join(FILTER_INDEX_SQL))
     app.run(debug=True)
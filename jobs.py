@@ -0,0 +1,271 @@
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from flask import session
+from sqlalchemy import Boolean, Column, Float, MetaData, String, Table, Text, delete, func, select, text, update
+from db import get_engine
+
+# Bounded job queue for slow calls (LLM requests) made from the Dash apps:
+# callbacks submit a job and return at once, a fixed pool of worker threads
+# runs it, and the page polls the job's status with a dcc.Interval.
+#
+# A job runs in the process that accepted it, but its state, progress, result
+# and cancel flag live in the app_jobs table, so with several worker processes
+# a poll or cancel reaching any of them sees the same job, and PER_USER_JOBS
+# holds across processes.
+
+JOB_WORKERS = 8        # Jobs running at once per process
+MAX_QUEUED_JOBS = 64   # Jobs waiting for a worker, per process, before new submissions are rejected
+PER_USER_JOBS = 2      # Queued plus running jobs allowed per user, across processes
+FINISHED_JOB_TTL = 600 # Seconds a finished job's result is kept for polling
+PROGRESS_FLUSH_SECONDS = 0.2  # Minimum interval between progress writes of a generator job
+HEARTBEAT_SECONDS = 2  # How often a process marks its jobs alive and picks up cancel requests
+STALE_JOB_SECONDS = 30 # A job not marked alive for this long lost its process and is reported failed
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+jobs_table = Table(
+    "app_jobs", metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False, index=True),
+    Column("state", String, nullable=False),  # queued -> running -> done | failed | cancelled
+    Column("progress", Text),  # JSON
+    Column("result", Text),    # JSON
+    Column("error", Text),
+    Column("cancel_requested", Boolean, nullable=False, default=False),
+    Column("updated_at", Float, nullable=False),  # Wall clock; the heartbeat keeps it fresh
+    Column("finished_at", Float, index=True),
+)
+
+def dumps(value):
+    return None if value is None else json.dumps(value, default=str)
+
+def loads(value):
+    return None if value is None else json.loads(value)
+
+class JobRejected(Exception):
+    """The queue is full or the user already has PER_USER_JOBS jobs in flight."""
+
+class Job:
+    def __init__(self, user_id, fn, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.state = "queued"
+        self.progress = None
+        self.cancel_requested = threading.Event()
+        self.submitted_at = time.monotonic()
+
+class JobQueue:
+    """Run submitted callables on a fixed pool of threads, with per-user limits.
+
+    A generator function is run step by step: each yielded value becomes the
+    job's progress (and the last one its result), and cancellation takes effect
+    between steps. Plain functions can only be cancelled while still queued.
+    Progress and results are stored as JSON, so they must be JSON-serializable.
+    """
+
+    def __init__(self, engine, workers=JOB_WORKERS, max_queued=MAX_QUEUED_JOBS, per_user=PER_USER_JOBS):
+        self.engine = engine
+        self.workers = workers
+        self.max_queued = max_queued
+        self.per_user = per_user
+        self.local = {}  # job id -> Job, for jobs queued or running in this process
+        self.pending = deque()
+        self.counts = Counter()
+        self.wait_seconds = deque(maxlen=1000)  # Queue waits of recent jobs
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.threads = []
+        self.tables_ready = False
+        self.setup_lock = threading.Lock()
+
+    def setup(self):
+        # The table is created on first use, so importing an app touches no database
+        if self.tables_ready:
+            return
+        with self.setup_lock:
+            if not self.tables_ready:
+                metadata.create_all(self.engine)
+                self.tables_ready = True
+
+    def start(self):
+        # Threads are started on first submit, so importing an app does not spawn them
+        for _ in range(self.workers - len(self.threads)):
+            thread = threading.Thread(target=self.work, name=f"job-worker-{len(self.threads)}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        heartbeat = threading.Thread(target=self.heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self.threads.append(heartbeat)
+
+    def submit(self, user_id, fn, *args, **kwargs):
+        """Queue `fn(*args, **kwargs)` for `user_id` and return the job id."""
+        self.setup()
+        job = Job(user_id, fn, args, kwargs)
+        with self.lock:
+            if len(self.pending) >= self.max_queued:
+                self.counts["rejected"] += 1
+                raise JobRejected("Too many requests are waiting; please try again shortly.")
+
+        now = time.time()
+        with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Serialize a user's submissions, so concurrent ones on other workers cannot both pass the limit
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:user_id))"), {"user_id": user_id})
+            conn.execute(delete(jobs_table).where(jobs_table.c.finished_at < now - FINISHED_JOB_TTL))
+            active = conn.execute(select(func.count()).select_from(jobs_table).where(
+                jobs_table.c.user_id == user_id, jobs_table.c.finished_at.is_(None),
+                jobs_table.c.updated_at >= now - STALE_JOB_SECONDS)).scalar()
+            if active >= self.per_user:
+                with self.lock:
+                    self.counts["rejected"] += 1
+                raise JobRejected(f"You already have {self.per_user} requests in progress.")
+            conn.execute(jobs_table.insert().values(id=job.id, user_id=user_id, state="queued",
+                                                    cancel_requested=False, updated_at=now))
+
+        with self.lock:
+            if not self.threads:
+                self.start()
+            self.local[job.id] = job
+            self.pending.append(job)
+            self.counts["submitted"] += 1
+            self.ready.notify()
+        return job.id
+
+    def status(self, job_id):
+        """State, latest progress, result and error of a job, or None if it is unknown or expired."""
+        self.setup()
+        with self.engine.connect() as conn:
+            row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+        if row is None:
+            return None
+        state, error = row.state, row.error
+        if row.finished_at is None and row.updated_at < time.time() - STALE_JOB_SECONDS:
+            state, error = "failed", "The server process handling this request stopped."
+        return {"id": row.id, "state": state, "progress": loads(row.progress), "result": loads(row.result), "error": error}
+
+    def cancel(self, job_id):
+        """Cancel a queued job outright or ask a running one to stop; False if it already finished."""
+        self.setup()
+        with self.engine.begin() as conn:
+            requested = conn.execute(update(jobs_table).where(
+                jobs_table.c.id == job_id, jobs_table.c.finished_at.is_(None)).values(cancel_requested=True)).rowcount > 0
+        # A job owned by another process sees the flag on its next heartbeat
+        with self.lock:
+            job = self.local.get(job_id)
+            if job is None:
+                return requested
+            job.cancel_requested.set()
+            if job.state != "queued":
+                return requested
+            self.pending.remove(job)
+        self.finish(job, "cancelled")
+        return requested
+
+    def metrics(self):
+        """Queue depth, running jobs, per-outcome counts and queue wait times of this process."""
+        with self.lock:
+            waits = self.wait_seconds
+            return {
+                "queued": len(self.pending),
+                "running": sum(1 for job in self.local.values() if job.state == "running"),
+                "workers": self.workers,
+                **{name: self.counts[name] for name in ("submitted", "done", "failed", "cancelled", "rejected")},
+                "wait_seconds_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_seconds_max": max(waits, default=0.0),
+            }
+
+    def work(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.ready.wait()
+                job = self.pending.popleft()
+                job.state = "running"
+                self.wait_seconds.append(time.monotonic() - job.submitted_at)
+            if job.cancel_requested.is_set():
+                self.finish(job, "cancelled")  # Cancelled from another process while queued
+                continue
+            try:
+                self.write(job.id, state="running")
+                self.run(job)
+            except Exception:
+                logger.exception("Job %s could not be recorded", job.id)
+                with self.lock:
+                    self.local.pop(job.id, None)
+
+    def run(self, job):
+        state, result, error = "done", None, None
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+            if inspect.isgenerator(result):
+                steps = result
+                flushed = 0.0  # The first step is written at once
+                for result in steps:
+                    job.progress = result
+                    if job.cancel_requested.is_set():
+                        steps.close()
+                        state = "cancelled"
+                        break
+                    if time.monotonic() - flushed >= PROGRESS_FLUSH_SECONDS:
+                        self.write(job.id, progress=dumps(result))
+                        flushed = time.monotonic()
+                else:
+                    result = job.progress
+        except Exception as e:
+            state, error = "failed", str(e)
+        self.finish(job, state, result, error)
+
+    def finish(self, job, state, result=None, error=None):
+        try:
+            self.write(job.id, state=state, progress=dumps(job.progress), result=dumps(result), error=error,
+                       finished_at=time.time())
+        finally:
+            with self.lock:
+                job.state = state
+                self.local.pop(job.id, None)
+                self.counts[state] += 1
+
+    def write(self, job_id, **values):
+        with self.engine.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(updated_at=time.time(), **values))
+
+    def heartbeat(self):
+        # Keep this process's jobs from looking stale, and pass on cancels made through other processes
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self.lock:
+                job_ids = list(self.local)
+            if not job_ids:
+                continue
+            try:
+                with self.engine.begin() as conn:
+                    mine = jobs_table.c.id.in_(job_ids)
+                    conn.execute(update(jobs_table).where(mine, jobs_table.c.finished_at.is_(None))
+                                 .values(updated_at=time.time()))
+                    cancelled = conn.execute(select(jobs_table.c.id).where(
+                        mine, jobs_table.c.cancel_requested.is_(True))).scalars().all()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+                continue
+            with self.lock:
+                for job_id in cancelled:
+                    if job_id in self.local:
+                        self.local[job_id].cancel_requested.set()
+
+job_queue = JobQueue(get_engine())
+
+def session_user_id():
+    """Per-browser id to key PER_USER_JOBS on, kept in the Flask session (the app needs a secret_key)."""
+    if "job_user_id" not in session:
+        session["job_user_id"] = uuid.uuid4().hex
+    return session["job_user_id"]
@@ -0,0 +1,104 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Response cache in front of the LLM entry points (exp1, rag, rag_new). An
+# exact tier matches the normalized prompt plus a hash of the context it was
+# answered with (retrieved documents or earlier turns); an optional semantic
+# tier matches paraphrases by embedding similarity within the same context.
+
+RESPONSE_CACHE_SIZE = 1024  # Entries kept per cache, least recently used evicted first
+RESPONSE_TTL_SECONDS = 3600
+SIMILARITY_THRESHOLD = 0.95  # Cosine similarity for a semantic hit
+
+def normalize_prompt(text):
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").lower()
+
+def context_hash(context):
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """LRU cache of answers with a TTL, keyed on (normalized prompt, context).
+
+    Pass `embedding` (the prompt's embedding vector) to `get` and `put` to use
+    the semantic tier; it is off when `threshold` is None.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_TTL_SECONDS, threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()  # key -> (answer, context hash, unit embedding or None, expires at)
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def key(self, prompt, context):
+        return hashlib.sha256(f"{normalize_prompt(prompt)}\0{context_hash(context)}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt, context="", embedding=None):
+        """Cached answer for `prompt` asked with `context`, or None on a miss."""
+        key = self.key(prompt, context)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[3] <= now:
+                del self.entries[key]
+                self.counts["expired"] += 1
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+                self.counts["exact_hits"] += 1
+                return entry[0]
+
+            if embedding is not None and self.threshold is not None:
+                match = self.most_similar(context_hash(context), unit(embedding), now)
+                if match:
+                    self.entries.move_to_end(match)
+                    self.counts["semantic_hits"] += 1
+                    return self.entries[match][0]
+
+            self.counts["misses"] += 1
+            return None
+
+    def put(self, prompt, context, answer, embedding=None):
+        key = self.key(prompt, context)
+        with self.lock:
+            self.entries[key] = (answer, context_hash(context), None if embedding is None else unit(embedding),
+                                 time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts["evicted"] += 1
+
+    def invalidate(self):
+        """Drop every entry; call when the knowledge base the answers came from changes."""
+        with self.lock:
+            self.counts["invalidated"] += len(self.entries)
+            self.entries.clear()
+
+    def metrics(self):
+        with self.lock:
+            counts = dict(self.counts)
+            size = len(self.entries)
+        hits = counts.get("exact_hits", 0) + counts.get("semantic_hits", 0)
+        lookups = hits + counts.get("misses", 0)
+        return {"size": size, "hit_rate": hits / lookups if lookups else 0.0, **counts}
+
+    def most_similar(self, context_key, embedding, now):
+        # Caller holds self.lock; a linear scan is cheap at RESPONSE_CACHE_SIZE entries next to an LLM call
+        best, best_score = None, self.threshold
+        for key, (answer, entry_context, entry_embedding, expires_at) in self.entries.items():
+            if entry_embedding is None or entry_context != context_key or expires_at <= now:
+                continue
+            score = float(np.dot(embedding, entry_embedding))
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+def unit(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
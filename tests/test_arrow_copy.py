@@ -0,0 +1,32 @@
+import datetime
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from arrow_copy import encode_batch, plan_target_schema
+
+def test_text_copy_escapes_control_characters_and_writes_nulls():
+    batch = pa.record_batch({
+        "id": pa.array([1, None]),
+        "name": pa.array(["tab\there", "back\\slash\nline\r"]),
+        "tag": pa.array(["x", None]).dictionary_encode(),
+        "flag": pa.array([True, None]),
+        "at": pa.array([datetime.datetime(2024, 1, 2, 3, 4, 5), None], pa.timestamp("us")),
+        "raw": pa.array([b"\x00\xff", None]),
+    })
+    assert encode_batch(batch, "text").decode("utf-8").split("\n") == [
+        "1\ttab\\there\tx\ttrue\t2024-01-02 03:04:05.000000\t\\\\x00ff",
+        "\\N\tback\\\\slash\\nline\\r\t\\N\t\\N\t\\N\t\\N",
+        "",
+    ]
+
+def test_text_copy_of_sliced_batch_only_holds_its_rows():
+    batch = pa.record_batch({"id": pa.array(range(10)), "name": pa.array([f"row {n}" for n in range(10)])})
+    assert encode_batch(batch.slice(3, 2), "text", rows_per_chunk=1) == b"3\trow 3\n4\trow 4\n"
+
+def test_plan_without_projection_rejects_columns_missing_from_the_table():
+    schema = pa.schema([("id", pa.int64()), ("extra", pa.string())])
+    target, copy_format = plan_target_schema(schema, {"id": "int4"}, ["id"])
+    assert target == pa.schema([("id", pa.int32())]) and copy_format == "binary"
+    with pytest.raises(ValueError, match="'extra' is not a column"):
+        plan_target_schema(schema, {"id": "int4"}, ["id"], project=False)
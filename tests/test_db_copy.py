@@ -0,0 +1,26 @@
+import pytest
+
+for module in ("pyarrow", "psycopg2", "sqlalchemy"):
+    pytest.importorskip(module)
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from db_copy import row_groups_share_keys
+
+def write_row_groups(path, *row_groups, **options):
+    with pq.ParquetWriter(path, pa.schema([("id", pa.int64()), ("part", pa.int64())]), **options) as writer:
+        for keys in row_groups:
+            writer.write_table(pa.table({"id": keys, "part": [len(keys)] * len(keys)}))
+    return pq.ParquetFile(path)
+
+def test_disjoint_key_ranges_do_not_share_keys(tmp_path):
+    assert not row_groups_share_keys(write_row_groups(tmp_path / "a.parquet", [3, 1, 2], [4, 6, 5]), ["id"])
+
+def test_interleaved_but_distinct_keys_do_not_share_keys(tmp_path):
+    parquet_file = write_row_groups(tmp_path / "a.parquet", [1, 3, 5], [2, 4, 6], write_statistics=False)
+    assert not row_groups_share_keys(parquet_file, ["id"])
+
+def test_key_in_two_row_groups_is_detected(tmp_path):
+    parquet_file = write_row_groups(tmp_path / "a.parquet", [1, 3, 5], [2, 5])
+    assert row_groups_share_keys(parquet_file, ["id"])
+    assert not row_groups_share_keys(parquet_file, ["id", "part"])
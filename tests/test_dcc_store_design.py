@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+for module in ("dash", "dash_mantine_components", "dash_ag_grid", "flask_session", "psycopg2", "sqlalchemy"):
+    pytest.importorskip(module)
+
+import dcc_store_design
+from dcc_store_design import NgramIndex, merge_changes
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["id", "column1", "deleted_at"])
+
+def apply_refresh(df, index, changes):
+    merged, removed, added = merge_changes(df, changes)
+    return merged, index.updated(removed, added["column1"])
+
+@pytest.fixture(autouse=True)
+def no_compaction(monkeypatch):
+    # Keep the deltas around so the tests exercise them rather than a rebuild
+    monkeypatch.setattr(dcc_store_design, "INDEX_COMPACT_RATIO", 10.0)
+
+def test_search_matches_substring_case_insensitively():
+    df = frame([[1, "Apple pie", None], [2, "banana", None], [3, "pineapple", None]])
+    index = NgramIndex(df["column1"])
+    assert sorted(index.search("APPLE")) == [0, 2]
+    assert index.search("ap") is None  # Shorter than a trigram
+
+def test_refresh_replaces_changed_rows_and_drops_tombstones():
+    df = frame([[1, "alpha", None], [2, "beta", None], [3, "gamma", None]])
+    index = NgramIndex(df["column1"])
+    changes = frame([[2, "betamax", None], [3, "gamma", "2024-01-01"]])
+    merged, index = apply_refresh(df, index, changes)
+    assert sorted(merged["id"]) == [1, 2]
+    assert merged.loc[index.search("betamax"), "id"].tolist() == [2]
+    assert len(index.search("gamma")) == 0
+
+def test_label_reused_after_tombstone_is_searchable():
+    df = frame([[n, f"row {n}", None] for n in range(10)])
+    index = NgramIndex(df["column1"])
+
+    # Tombstoning the row with the highest label frees that label...
+    df, index = apply_refresh(df, index, frame([[9, "row 9", "2024-01-01"]]))
+    assert df.index.max() == 8
+
+    # ...and the next refresh hands it to a new row, which must still be found
+    df, index = apply_refresh(df, index, frame([[10, "fresh row", None]]))
+    assert df.loc[df["id"] == 10].index.tolist() == [9]
+    assert df.loc[index.search("fresh"), "id"].tolist() == [10]
+    assert len(index.search("row 9")) == 0
+
+def test_reused_label_with_matching_text_is_returned_once():
+    df = frame([[n, f"row {n}", None] for n in range(10)])
+    index = NgramIndex(df["column1"])
+    df, index = apply_refresh(df, index, frame([[9, "row 9", "2024-01-01"]]))
+    df, index = apply_refresh(df, index, frame([[10, "row 9 again", None]]))
+    assert index.search("row 9").tolist() == [9]
+    assert df.loc[index.search("row 9"), "id"].tolist() == [10]
+
+def test_drop_unchanged_keeps_only_new_and_changed_rows():
+    df = frame([[1, "alpha", None], [2, "beta", None]])
+    changes = frame([[1, "alpha", None], [2, "beta v2", None], [3, "gamma", None]])
+    assert dcc_store_design.drop_unchanged(df, changes)["id"].tolist() == [2, 3]
+    assert dcc_store_design.drop_unchanged(df, frame([[1, "alpha", None]])).empty
+
+def test_refresh_after_tombstone_keeps_watermark_and_skips_rewrite(tmp_path, monkeypatch):
+    columns = ["id", "column1", "updated_at", "deleted_at"]
+    rows = [[1, "alpha", pd.Timestamp("2024-01-01 10:00"), None], [2, "beta", pd.Timestamp("2024-01-01 11:00"), None]]
+    tombstone = [2, "beta", pd.Timestamp("2024-01-01 12:00"), pd.Timestamp("2024-01-01 12:00")]
+    fetches = [pd.DataFrame(rows, columns=columns)] + [pd.DataFrame([tombstone], columns=columns)] * 4
+    monkeypatch.setattr(dcc_store_design, "fetch_data", lambda query, params=None: fetches.pop(0))
+    cache = dcc_store_design.DatasetCache(cache_dir=str(tmp_path), refresh_interval=0)
+    writes = []
+    write = cache.write
+    monkeypatch.setattr(cache, "write", lambda df, path: (writes.append(len(df)), write(df, path)))
+
+    version, df = cache.get("query")
+    cache.refresh("query")
+    assert writes == [2, 1]  # The reload, then the refresh that applied the tombstone
+    for _ in range(3):
+        _, df = cache.refresh("query")  # The overlap re-fetches the tombstone every time
+    assert writes == [2, 1]
+    assert df["id"].tolist() == [1]
+    assert cache.entry("query")["watermark"] == pd.Timestamp("2024-01-01 12:00")
+
+def test_grid_rows_come_from_query_without_tombstones_in_key_order():
+    sql, params = dcc_store_design.build_rows_query({
+        "startRow": 20, "endRow": 30, "sortModel": [{"colId": "column2", "sort": "desc"}],
+        "filterModel": {"column1": {"filterType": "text", "type": "contains", "filter": "50%"}},
+    })
+    assert sql == ('SELECT "column1", "column2" FROM (SELECT * FROM your_table) AS source '
+                   'WHERE "deleted_at" IS NULL AND "column1"::text ILIKE %s '
+                   'ORDER BY "column2" DESC, "id" ASC LIMIT %s OFFSET %s')
+    assert params == ["%50\\%%", 10, 20]
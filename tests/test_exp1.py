@@ -0,0 +1,59 @@
+import os
+from functools import partial
+import pytest
+
+for module in ("dash", "flask", "psycopg2", "sqlalchemy", "tiktoken", "langchain_openai", "langchain_core"):
+    pytest.importorskip(module)
+
+# The module builds its Azure chat model at import; these only let it construct, nothing is called
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://example.invalid")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-02-01")
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from sqlalchemy.orm import sessionmaker
+import exp1
+from db import get_engine, session_scope
+from response_cache import ResponseCache
+
+REPLY = "Streaming replies arrive a few words at a time"
+
+@pytest.fixture
+def conversation(tmp_path, monkeypatch):
+    engine = get_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    monkeypatch.setattr(exp1, "tables_ready", False)
+    exp1.init_db(engine)
+    monkeypatch.setattr(exp1, "session_scope", partial(session_scope, sessionmaker(bind=engine)))
+    monkeypatch.setattr(exp1, "count_tokens", lambda message: len(message["content"].split()) + 4)  # No tokenizer download
+    monkeypatch.setattr(exp1, "response_cache", ResponseCache(threshold=None))
+    monkeypatch.setattr(exp1, "history_cache", exp1.HistoryCache())
+    saves = []
+    save_exchange = exp1.save_exchange
+    monkeypatch.setattr(exp1, "save_exchange", lambda *args: (saves.append(args), save_exchange(*args)))
+    return exp1.create_conversation("user", "test"), saves
+
+def fake_model():
+    return GenericFakeChatModel(messages=iter([AIMessage(content=REPLY)]))
+
+def test_stream_yields_growing_reply_and_saves_once_at_the_end(conversation):
+    conversation_id, saves = conversation
+    stream = exp1.stream_chat_with_gpt(conversation_id, "How do replies arrive?", fake_model())
+    partials = [next(stream), next(stream)]
+    assert not saves and exp1.get_conversation_history(conversation_id) == []
+    partials += list(stream)
+
+    assert partials[-1] == REPLY
+    assert len(partials) > 2 and all(later.startswith(earlier) for earlier, later in zip(partials, partials[1:]))
+    assert saves == [(conversation_id, "How do replies arrive?", REPLY)]
+    assert exp1.get_conversation_history(conversation_id) == [
+        {"role": "user", "content": "How do replies arrive?"},
+        {"role": "assistant", "content": REPLY},
+    ]
+
+def test_cancelled_stream_is_not_saved(conversation):
+    conversation_id, saves = conversation
+    stream = exp1.stream_chat_with_gpt(conversation_id, "How do replies arrive?", fake_model())
+    assert REPLY.startswith(next(stream))
+    stream.close()  # What the job queue does when a running job is cancelled
+    assert not saves and exp1.get_conversation_history(conversation_id) == []
@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+
+for module in ("flask", "psycopg2", "sqlalchemy"):
+    pytest.importorskip(module)
+
+import jobs
+from db import get_engine
+from jobs import JobQueue, JobRejected
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    # Two queues on one database stand in for two worker processes behind a load balancer
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(jobs, "PROGRESS_FLUSH_SECONDS", 0.0)
+    engine = get_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    return JobQueue(engine, workers=2), JobQueue(engine, workers=2)
+
+def wait_for(queue, job_id, states, progress=None, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.status(job_id)
+        if job and job["state"] in states and (progress is None or job["progress"] == progress):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {states}: {queue.status(job_id)}")
+
+def test_status_and_progress_are_visible_from_another_worker(workers):
+    first, second = workers
+    release = threading.Event()
+
+    def stream():
+        yield "partial"
+        release.wait(5)
+        yield "partial reply"
+
+    job_id = first.submit("user", stream)
+    wait_for(second, job_id, {"running"}, progress="partial")
+    release.set()
+    job = wait_for(second, job_id, {"done"})
+    assert job["result"] == "partial reply"
+
+def test_per_user_limit_holds_across_workers(workers):
+    first, second = workers
+    release = threading.Event()
+    first.submit("user", release.wait, 5)
+    first.submit("user", release.wait, 5)
+    with pytest.raises(JobRejected):
+        second.submit("user", release.wait, 5)
+    second.submit("someone else", release.wait, 5)
+    release.set()
+
+def test_cancel_through_another_worker_stops_a_running_job(workers):
+    first, second = workers
+
+    def endless():
+        while True:
+            yield "..."
+            time.sleep(0.01)
+
+    job_id = first.submit("user", endless)
+    wait_for(second, job_id, {"running"})
+    assert second.cancel(job_id)
+    assert wait_for(second, job_id, {"cancelled"})["progress"] == "..."
+
+def test_job_of_a_dead_worker_is_reported_failed(workers, monkeypatch):
+    first, second = workers
+    job_id = first.submit("user", threading.Event().wait, 5)
+    monkeypatch.setattr(jobs, "STALE_JOB_SECONDS", -1)  # As if its heartbeat had stopped
+    assert second.status(job_id)["state"] == "failed"
+    assert second.status("unknown") is None
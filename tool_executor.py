@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import ToolMessage
+
+# Runs all tool calls of an AI message concurrently: coroutine tools on an
+# event loop, sync tools on a bounded thread pool. A turn with several tool
+# calls then takes as long as its slowest tool rather than the sum.
+
+TOOL_TIMEOUT_SECONDS = 30
+TOOL_THREADS = 8
+TOOL_CACHE_SIZE = 512  # Results kept for tools marked idempotent
+
+class ToolExecutor:
+    """Execute tool calls concurrently with per-tool timeouts, a result cache and latency metrics.
+
+    `timeouts` maps tool names to seconds, overriding TOOL_TIMEOUT_SECONDS. Tools
+    created with metadata={"idempotent": True} have their results cached by
+    name and arguments.
+    """
+
+    def __init__(self, tools, timeouts=None, threads=TOOL_THREADS, cache_size=TOOL_CACHE_SIZE):
+        self.tools = {tool.name: tool for tool in tools}
+        self.timeouts = timeouts or {}
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tool")
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.latencies = defaultdict(lambda: deque(maxlen=1000))  # Recent call latencies per tool
+        self.counts = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def run(self, tool_calls):
+        """ToolMessages for `tool_calls`, in the same order; for use from sync graph nodes."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun(tool_calls))
+        # Called from inside a running loop: run on a fresh loop in another thread
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.arun(tool_calls)).result()
+
+    async def arun(self, tool_calls):
+        return await asyncio.gather(*(self.call(tool_call) for tool_call in tool_calls))
+
+    async def call(self, tool_call):
+        name, args, call_id = tool_call["name"], tool_call["args"], tool_call["id"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return ToolMessage(content=f"Error: unknown tool {name!r}", tool_call_id=call_id, name=name, status="error")
+
+        cacheable = bool(tool.metadata and tool.metadata.get("idempotent"))
+        key = (name, json.dumps(args, sort_keys=True, default=str))
+        if cacheable:
+            with self.lock:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    self.counts[name]["cache_hits"] += 1
+                    return ToolMessage(content=self.cache[key], tool_call_id=call_id, name=name)
+
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            if getattr(tool, "coroutine", None) is not None:
+                work = tool.ainvoke(args)
+            else:
+                # A timed-out sync tool keeps its thread until it returns; the turn does not wait for it
+                work = asyncio.get_running_loop().run_in_executor(self.threads, tool.invoke, args)
+            result = await asyncio.wait_for(work, timeout=self.timeouts.get(name, TOOL_TIMEOUT_SECONDS))
+            content = result if isinstance(result, str) else json.dumps(result, default=str)
+            message = ToolMessage(content=content, tool_call_id=call_id, name=name)
+        except asyncio.TimeoutError:
+            outcome = "timeouts"
+            message = ToolMessage(content=f"Error: {name} timed out", tool_call_id=call_id, name=name, status="error")
+        except Exception as e:
+            outcome = "errors"
+            message = ToolMessage(content=f"Error: {e!r}", tool_call_id=call_id, name=name, status="error")
+
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            self.counts[name][outcome] += 1
+            if cacheable and outcome == "ok":
+                self.cache[key] = message.content
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return message
+
+    def metrics(self):
+        """Per tool: successful calls, errors, timeouts, cache hits and latency (avg, p95, max) of recent calls."""
+        with self.lock:
+            report = {}
+            for name in set(self.latencies) | set(self.counts):
+                latencies = sorted(self.latencies[name])
+                report[name] = {
+                    **{outcome: self.counts[name][outcome] for outcome in ("ok", "errors", "timeouts", "cache_hits")},
+                    "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+                    "latency_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                    "latency_max": latencies[-1] if latencies else 0.0,
+                }
+            return report